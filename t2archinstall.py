@@ -28,17 +28,349 @@ import os
 import signal
 import subprocess
 import shlex
-import codecs
+import shutil
 import asyncio
-import json
+import functools
+import inspect
 import re
 import tempfile
-from typing import Optional
+import time
+import urllib.request
+from typing import Iterable, Optional, TypeVar, Union
+from rich.text import Text
 from textual import on
 from textual.app import App, ComposeResult
 from textual.containers import Horizontal, Vertical, VerticalScroll
+from textual.widget import Widget
 from textual.widgets import Button, Header, Footer, Static, Input, RichLog, TabbedContent, TabPane, RadioSet, RadioButton
 
+WidgetT = TypeVar("WidgetT", bound=Widget)
+
+# Single-quoted spans are literal to the shell; whatever is left decides whether /bin/sh is needed.
+_SHELL_QUOTED = re.compile(r"'[^']*'")
+_SHELL_SYNTAX = re.compile(r"[|&;<>()$`\\\"*?\[\]{}~#\n]|^\s*\w+=")
+
+# One KEY="value" pair from `lsblk -P` output.
+_LSBLK_PAIR = re.compile(r'(\w+)="([^"]*)"')
+
+# Any of the three (possibly commented) lid switch settings in logind.conf, matched in a single pass.
+_LID_SWITCH_LINE = re.compile(r"^#*(HandleLidSwitch(?:Docked|ExternalPower)?)=.*", re.M)
+# tiny-dfr's MediaLayerDefault when it is turned off.
+_MEDIA_LAYER_OFF = re.compile(r"^MediaLayerDefault[ \t]*=[ \t]*false", re.M)
+
+def _split_simple_command(command: str) -> Optional[list[str]]:
+    """Return argv for a command that needs no shell features, or None if it must run through /bin/sh."""
+    if _SHELL_SYNTAX.search(_SHELL_QUOTED.sub("", command)):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    # Builtins such as cd or export only exist inside a shell.
+    if not argv or shutil.which(argv[0]) is None:
+        return None
+    return argv
+
+# Matches commands that may leave a stale pacman lock behind if they fail.
+_PACMAN_COMMAND = re.compile(r"\bpac(?:man|strap)\b", re.IGNORECASE)
+
+# Partition number at the end of a device name (nvme0n1p7 -> 7).
+_TRAILING_DIGITS = re.compile(r"(\d+)$")
+
+# Partition types and filesystems that belong to macOS and must never be deleted.
+_MAC_PARTITION_TYPES = frozenset({
+    "7c3457ef-0000-11aa-aa11-00306543ecac",  # APFS
+    "48465300-0000-11aa-aa11-00306543ecac",  # HFS+
+})
+_MAC_FSTYPES = frozenset({"apfs", "hfsplus", "hfs"})
+_EXFAT_PARTITION_TYPE = "ebd0a0a2-b9e5-4433-87c0-68b6b72699c7"
+_EXFAT_FSTYPES = frozenset({"exfat", "vfat"})
+
+# Filesystem metadata that is auto-created and does not count as user data.
+_PARTITION_METADATA_ITEMS = frozenset({
+    "lost+found",                # ext2/3/4 metadata
+    "System Volume Information", # Windows metadata
+    "$RECYCLE.BIN",              # Windows recycle bin
+    ".Trashes",                  # macOS trash
+    ".fseventsd",                # macOS file system events
+    ".Spotlight-V100",           # macOS Spotlight indexing
+    ".TemporaryItems",           # macOS temporary items
+    ".VolumeIcon.icns",          # macOS volume icon
+    ".DS_Store",                 # macOS Desktop Services Store
+})
+
+# Number of packages pacman downloads at once, and the pacman.conf line that sets it (commented or not).
+PARALLEL_DOWNLOADS = 10
+_PARALLEL_DOWNLOADS_LINE = re.compile(r"(#\s*)?ParallelDownloads\s*=\s*(\d*)")
+
+# How long a successful T2 repository sync of the target system is reused before syncing again.
+T2_REPO_SYNC_TTL = 30 * 60
+
+# Separators accepted between locales in the Locale tab.
+_LOCALE_SPLIT = re.compile(r"[,\s]+")
+
+# The active (uncommented) HOOKS=(...) line in mkinitcpio.conf.
+_MKINITCPIO_HOOKS = re.compile(r"^HOOKS=\(([^)]*)\)")
+
+# Host tools the install steps shell out to (partitioning, formatting, pacstrap and the chroot).
+INSTALL_TOOLS = (
+    "lsblk", "sfdisk", "mkfs.fat", "mkswap", "mkfs.ext4", "mkfs.btrfs", "btrfs",
+    "udevadm", "pvcreate", "vgcreate", "lvcreate", "pacstrap", "genfstab", "arch-chroot", "stdbuf",
+)
+
+# Packages for the macOS startup manager icon and label (Boot tab).
+BOOT_ICON_PACKAGES = ("librsvg", "libicns")
+BOOT_LABEL_PACKAGES = ("python-pillow", "tex-gyre-fonts")
+
+# Arch logo used for the boot icon, where it is cached on the host across installs,
+# and where it is kept in the target system once downloaded.
+BOOT_ICON_URL = "https://archlinux.org/logos/archlinux-icon-crystal-64.svg"
+BOOT_ICON_CACHE = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "t2archinstall", "arch.svg")
+BOOT_ICON_SVG = "/var/tmp/arch.svg"
+
+# Packages shared by the window manager setups (Niri).
+WM_SHARED_PACKAGES = (
+    "xdg-user-dirs", "xdg-desktop-portal", "xdg-desktop-portal-wlr", "xdg-desktop-portal-gtk", "xdg-utils",
+    "pipewire", "pipewire-alsa", "pipewire-pulse", "pipewire-zeroconf", "wireplumber", "gvfs", "ffmpeg", "accountsservice",
+    "polkit", "polkit-gnome", "swaync", "swayosd", "noto-fonts", "ttf-dejavu", "noto-fonts-emoji", "inter-font", "otf-font-awesome",
+    "waybar", "wl-clipboard", "grim", "slurp", "kanshi", "mako", "fuzzel", "ghostty", "foot", "wayvnc", "jq", "brightnessctl", "duf",
+    "pavucontrol", "pamixer", "pulsemixer", "awww", "swappy", "satty", "kimageformats", "wf-recorder", "mpv", "mpd", "playerctl", "cava",
+    "cliphist", "udiskie", "cups-pk-helper", "network-manager-applet", "khal", "python-pywal", "pastel", "matugen", "imagemagick",
+    "wlr-randr", "wtype", "wlsunset", "dialog", "ddcutil", "i2c-tools", "tuned-ppd", "tesseract",  "tesseract-data-eng", "dgop"
+)
+
+# Packages and services for the desktop environments installed straight from the Arch repositories.
+DESKTOP_ENVIRONMENTS = {
+    "gnome": (
+        ("gnome", "gnome-extra", "gnome-tweaks", "gnome-power-manager", "power-profiles-daemon", "gdm"),
+        ("gdm.service", "power-profiles-daemon.service"),
+    ),
+    "kde": (("plasma", "kde-applications", "sddm"), ("plasmalogin.service",)),
+    "cosmic": (("cosmic", "greetd"), ("greetd.service", "cosmic-greeter.service")),
+}
+
+# sl-greeter, sl-lock and what they need at runtime, from slsrepo (Niri).
+SL_DESKTOP_UTILS_PACKAGES = ("quickshell-git", "niri", "sl-desktop-utils", "unzip", "wayidle-git")
+
+# Apple logo rendered as Plymouth's BGRT fallback when the firmware provides no boot logo.
+APPLE_LOGO_SVG = '<svg role="img" viewBox="0 0 290 290" xmlns="http://www.w3.org/2000/svg"><path fill="#ffffff" transform="translate(90 190) scale(4)" d="M12.152 6.896c-.948 0-2.415-1.078-3.96-1.04-2.04.027-3.91 1.183-4.961 3.014-2.117 3.675-.546 9.103 1.519 12.09 1.013 1.454 2.208 3.09 3.792 3.039 1.52-.065 2.09-.987 3.935-.987 1.831 0 2.35.987 3.96.948 1.637-.026 2.676-1.48 3.676-2.948 1.156-1.688 1.636-3.325 1.662-3.415-.039-.013-3.182-1.221-3.22-4.857-.026-3.04 2.48-4.494 2.597-4.559-1.429-2.09-3.623-2.324-4.39-2.376-2-.156-3.675 1.09-4.61 1.09zM15.53 3.83c.843-1.012 1.4-2.427 1.245-3.83-1.207.052-2.662.805-3.532 1.818-.78.896-1.454 2.338-1.273 3.714 1.338.104 2.715-.688 3.559-1.701"/></svg>'
+
+# greetd running the DMS greeter with Niri, and the service override that keeps it off the tty2 getty.
+GREETD_DMS_CONFIG = """[terminal]
+vt = 2
+
+[default_session]
+command = "dms-greeter --command niri"
+user = "greeter"
+"""
+
+GREETD_SERVICE_OVERRIDE = """[Unit]
+After=systemd-user-sessions.service plymouth-quit.service plymouth-quit-wait.service
+Conflicts=getty@tty2.service
+
+[Service]
+Environment=LIBSEAT_BACKEND=logind
+"""
+
+# Suspend workaround units (Extras tab); fill in with .format(modprobe_path=..., rmmod_path=...).
+SUSPEND_FIX_SERVICE = """[Unit]
+Description=Disable and re-enable services to try and fix suspend
+Before=sleep.target
+StopWhenUnneeded=yes
+
+[Service]
+User=root
+Type=oneshot
+RemainAfterExit=yes
+
+ExecStart={modprobe_path} -r brcmfmac_wcc
+ExecStart={modprobe_path} -r brcmfmac
+ExecStart={rmmod_path} -f apple-bce
+
+ExecStop={modprobe_path} apple-bce
+ExecStop={modprobe_path} brcmfmac
+ExecStop={modprobe_path} brcmfmac_wcc
+
+[Install]
+WantedBy=sleep.target
+"""
+
+# Extended variant, based on deqrocks's Suspend script.
+T2_SUSPEND_SERVICE = """[Unit]
+Description=Unload and Reload Modules for Suspend and Resume
+Before=sleep.target
+StopWhenUnneeded=yes
+
+[Service]
+User=root
+Type=oneshot
+RemainAfterExit=yes
+
+# ExecStart=-/usr/bin/bash -lc 'uid=$$(loginctl list-sessions --no-legend 2>/dev/null | awk "{{print \\$$2}}" | head -n1); [ -n "$$uid" ] || exit 0; [ -S "/run/user/$$uid/bus" ] || exit 0; username=$$(id -nu "$$uid" 2>/dev/null) || exit 0; XDG_RUNTIME_DIR="/run/user/$$uid" DBUS_SESSION_BUS_ADDRESS="unix:path=/run/user/$$uid/bus" runuser -u "$$username" -- systemctl --user stop pipewire.socket pipewire-pulse.socket pipewire.service pipewire-pulse.service wireplumber.service 2>/dev/null || true'
+# ExecStart=-{rmmod_path} -f apple_gmux
+# ExecStart=-/usr/bin/sh -c 'echo 1 > /sys/bus/pci/devices/0000:01:00.0/remove'
+# ExecStart=-/usr/bin/sh -c "/usr/bin/echo 0 | /usr/bin/tee /sys/class/leds/apple::kbd_backlight/brightness"
+ExecStart=-/bin/bash -c "/bin/echo 0 | tee /sys/class/leds/:white:kbd_backlight/brightness"
+# ExecStart=-{rmmod_path} hci_bcm4377
+# ExecStart=-{rmmod_path} brcmfmac_wcc
+# ExecStart=-{rmmod_path} brcmfmac
+# ExecStart=-{rmmod_path} brcmutil
+# ExecStart=-/usr/bin/systemctl stop tiny-dfr.service
+# ExecStart=-/usr/bin/pkill -9 tiny-dfr
+ExecStart=-{rmmod_path} appletbdrm
+ExecStart=-{rmmod_path} hid_appletb_kbd
+ExecStart=-{rmmod_path} hid_appletb_bl
+ExecStart=-{rmmod_path} -f apple-bce
+
+ExecStop={modprobe_path} apple-bce
+ExecStop=/usr/bin/sleep 4
+# ExecStop=-/usr/bin/sh -c 'echo 1 > /sys/bus/pci/rescan'
+# ExecStop=-{modprobe_path} apple_gmux
+# ExecStop=-{modprobe_path} brcmutil
+# ExecStop=-{modprobe_path} brcmfmac
+# ExecStop=-{modprobe_path} brcmfmac_wcc
+# ExecStop=-{modprobe_path} hci_bcm4377
+ExecStop=-{modprobe_path} hid_appletb_bl
+ExecStop=-{modprobe_path} hid_appletb_kbd
+ExecStop=-{modprobe_path} appletbdrm
+ExecStop=/usr/bin/sleep 2
+# ExecStopPost=-/usr/bin/systemctl reset-failed tiny-dfr.service
+# ExecStopPost=-/usr/bin/systemctl restart tiny-dfr.service
+# ExecStopPost=-/usr/bin/sh -c "/usr/bin/echo 255 | /usr/bin/tee /sys/class/leds/apple::kbd_backlight/brightness"
+ExecStopPost=-/bin/bash -c "/bin/echo 255 | tee /sys/class/leds/:white:kbd_backlight/brightness"
+# ExecStopPost=-/usr/bin/bash -lc 'uid=$$(loginctl list-sessions --no-legend 2>/dev/null | awk "{{print \\$$2}}" | head -n1); [ -n "$$uid" ] || exit 0; [ -S "/run/user/$$uid/bus" ] || exit 0; username=$$(id -nu "$$uid" 2>/dev/null) || exit 0; XDG_RUNTIME_DIR="/run/user/$$uid" DBUS_SESSION_BUS_ADDRESS="unix:path=/run/user/$$uid/bus" runuser -u "$$username" -- systemctl --user start pipewire.socket pipewire-pulse.socket wireplumber.service 2>/dev/null || true'
+ExecStopPost=-/usr/bin/systemctl restart upower
+
+[Install]
+WantedBy=sleep.target
+"""
+
+# systemd-boot and Limine load the kernel and initramfs from the ESP, so these copy them there.
+ESP_KERNEL_COPY_COMMANDS = (
+    "install -Dm0644 /boot/vmlinuz-linux-t2 /boot/efi/vmlinuz-linux-t2",
+    "install -Dm0644 /boot/initramfs-linux-t2.img /boot/efi/initramfs-linux-t2.img",
+    "[ -f /boot/initramfs-linux-t2-fallback.img ] && install -Dm0644 /boot/initramfs-linux-t2-fallback.img /boot/efi/initramfs-linux-t2-fallback.img || true",
+)
+
+# Prepended to batched scripts: stop at the first failure and say which command it was.
+_BATCH_PREAMBLE = "set -e -o pipefail\ntrap 'echo \"[ERROR] Failed: $BASH_COMMAND\" >&2' ERR\n"
+
+def _batch_script(commands: list[str]) -> str:
+    """Join commands into one bash script that stops at the first failing command."""
+    return _BATCH_PREAMBLE + "\n".join(commands)
+
+@functools.lru_cache(maxsize=None)
+def _binary_path(binary: str) -> str:
+    """Absolute path of a binary on PATH, falling back to /usr/bin. PATH does not change during a run."""
+    return shutil.which(binary) or f"/usr/bin/{binary}"
+
+def _download_file(url: str, dest: str, timeout: float = 30) -> None:
+    """Download url to dest, replacing dest only once the whole file has arrived."""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        data = response.read()
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = f"{dest}.part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, dest)
+
+def _is_svg_file(path: str) -> bool:
+    """Whether path holds a complete SVG document, not e.g. a captive-portal page or a cut-off download."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return False
+    return b"<svg" in data and data.rstrip().endswith(b"</svg>")
+
+def _needs_pacman_cleanup(cmd: str) -> bool:
+    return _PACMAN_COMMAND.search(cmd) is not None
+
+def _signal_process(proc: asyncio.subprocess.Process, sig: int) -> None:
+    try:
+        os.killpg(proc.pid, sig)
+    except Exception:
+        try:
+            proc.send_signal(sig)
+        except Exception:
+            pass
+
+async def _terminate_process(proc: Optional[asyncio.subprocess.Process], grace: float = 2.0) -> None:
+    """Ask the process group to exit with SIGTERM and fall back to SIGKILL after a grace period."""
+    if proc is None:
+        return
+    # SIGTERM lets pacman remove its own db.lck before exiting.
+    _signal_process(proc, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(proc.wait(), grace)
+    except asyncio.TimeoutError:
+        _signal_process(proc, signal.SIGKILL)
+        await proc.wait()
+
+def _is_partition_empty(kname: str) -> bool:
+    """
+    Check if a partition is empty (no files or only filesystem metadata).
+    Returns True if empty, False if has data or cannot be determined.
+    """
+    # Validate kname to ensure it's a valid block device path
+    if not kname or not kname.startswith("/dev/"):
+        return False
+
+    mount_point = None
+    mounted = False
+    try:
+        # Create a secure temporary mount point
+        mount_point = tempfile.mkdtemp(prefix="partition_check_")
+
+        # Try to mount the partition read-only
+        mount_result = subprocess.run(
+            ["mount", "-o", "ro", kname, mount_point],
+            capture_output=True,
+            text=True
+        )
+
+        if mount_result.returncode != 0:
+            # Cannot mount, assume not empty for safety
+            return False
+
+        # Mount succeeded
+        mounted = True
+
+        # Filter out known metadata - if anything else remains, partition has data
+        return all(item in _PARTITION_METADATA_ITEMS for item in os.listdir(mount_point))
+
+    except Exception:
+        # On any error, assume not empty for safety
+        return False
+    finally:
+        # Unmount if mounted
+        if mounted:
+            subprocess.run(["umount", mount_point], check=False, capture_output=True)
+        # Clean up mount point if it was created
+        if mount_point:
+            try:
+                os.rmdir(mount_point)
+            except Exception:
+                pass
+
+def _last_is_safe_to_delete(p: dict) -> bool:
+    """
+    Check if the last partition is safe to delete.
+    Only allow deletion of empty ExFAT partitions (created in macOS Disk Utility).
+    Never allow deletion of Mac partitions (APFS, HFS+) or partitions with data.
+    Prioritizes avoiding data loss at any cost.
+    """
+    # Mac partition types and filesystems should never be deleted
+    if p["parttype"] in _MAC_PARTITION_TYPES or p["fstype"] in _MAC_FSTYPES:
+        return False
+
+    # Only allow deletion of ExFAT partitions (this excludes Linux partitions)
+    if p["parttype"] != _EXFAT_PARTITION_TYPE and p["fstype"] not in _EXFAT_FSTYPES:
+        return False
+
+    # ExFAT partition - check if it's empty before allowing deletion
+    return _is_partition_empty(p["kname"])
+
 class T2ArchInstaller(App):
     """Main application for T2 Arch Linux installer."""
 
@@ -100,6 +432,17 @@ class T2ArchInstaller(App):
         ("0", "switch_tab(9)", "Completion"),
     ]
 
+    # Desktop buttons map to (de_type, is_manual) for install_desktop_environment.
+    DE_BUTTONS = {
+        "gnome_auto_btn": ("gnome", False),
+        "gnome_manual_btn": ("gnome", True),
+        "kde_auto_btn": ("kde", False),
+        "kde_manual_btn": ("kde", True),
+        "cosmic_auto_btn": ("cosmic", False),
+        "niri_auto_btn": ("niri", False),
+        "niridms_auto_btn": ("niridms", False),
+    }
+
     def __init__(self):
         super().__init__()
         self.post_install_mode = False
@@ -112,14 +455,64 @@ class T2ArchInstaller(App):
         self.use_lvm = False
         self.filesystem_type = "btrfs"
         self.bootloader_type = "grub"
+        self.use_plymouth = False
+        # Whether the last successful mkinitcpio run already included the plymouth hook.
+        self.plymouth_in_initramfs = False
         self.locales_added = []
+        self._all_locales = ["en_US.UTF-8"]
         self.lang_selected = "en_US.UTF-8"
         self.timezone = "UTC"
         self.username = ""
+        self._log_batch: list[str] = []
+        self._last_log_flush = 0.0
+        # monotonic() start of the running command, used to slow console repaints on long runs.
+        self._command_started: Optional[float] = None
+        # Widgets looked up by id through _widget, e.g. inputs and the buttons steps focus next.
+        self._widgets: dict[str, Widget] = {}
+        self._hidpi: Optional[bool] = None
+        self._icon_prefetch: Optional[asyncio.Task] = None
+        # monotonic() time of the last successful T2 repository sync, per target root (chroot button only).
+        self._t2_repo_synced: dict[str, float] = {}
+        # Target roots whose pacman.conf already has parallel downloads enabled by install_packages.
+        self._pacman_prepared: set[str] = set()
         self.tab_ids = [
             "start_tab", "partition_tab", "mount_tab", "time_tab", "packages_tab",
             "system_tab", "boot_tab", "desktop_tab", "extras_tab", "completion_tab"
         ]
+        # Buttons that simply run one installer step; on_button_pressed handles the rest.
+        self._button_handlers = {
+            "create_partitions_btn": self.create_partitions,
+            "mount_partitions_btn": self.mount_partitions,
+            "set_timezone_btn": self.set_timezone,
+            "add_locales_btn": self.add_locales,
+            "set_language_btn": self.set_language,
+            "add_repo_btn": self.add_t2_repository,
+            "pacstrap_auto_btn": self.install_base_system_auto,
+            "pacstrap_manual_btn": self.install_base_system_manual,
+            "fstab_btn": self.generate_fstab,
+            "chroot_repo_btn": self.add_t2_repo_to_chroot,
+            "config_basic_btn": self.configure_basic_system,
+            "set_hostname_btn": self.set_hostname,
+            "set_root_password_btn": self.set_root_password,
+            "config_sudo_btn": self.configure_sudoers,
+            "build_initramfs_btn": self.build_initramfs,
+            "install_bootloader_btn": self.install_bootloader,
+            "boot_icon_btn": self.create_boot_icon,
+            "boot_label_btn": self.create_boot_label,
+            "plymouth_btn": self.install_plymouth,
+            "create_user_btn": self.create_user_and_services,
+            "extras_btn": self.install_extras,
+            "tiny_dfr_btn": self.install_tiny_dfr,
+            "enable_hybrid_graphics_btn": self.enable_hybrid_graphics,
+            "recurring_network_notifications_fix_btn": self.recurring_network_notifications_fix,
+            "suspend_sleep_btn": self.disable_suspend_sleep,
+            "ignore_lid_btn": self.ignore_lid_switch,
+            "suspend_fix_btn": self.install_suspend_fix,
+            "extended_suspend_fix_btn": self.install_extended_suspend_fix,
+            "unmount_btn": self.unmount_system,
+            "reboot_btn": self.reboot_system,
+            "shutdown_btn": self.shutdown_system,
+        }
 
     def compose(self) -> ComposeResult:
         yield Header(icon="^", name="T2 Arch Linux Installer", show_clock=True)
@@ -128,18 +521,22 @@ class T2ArchInstaller(App):
                 with TabbedContent(id="main_tabs"):
                     with TabPane("Start", id="start_tab"):
                         with VerticalScroll(id="start_scroll", can_focus=False):
-                            yield Static("Welcome to the T2 Arch Linux Installer!")
-                            yield Static("")
-                            yield Static("Start by entering the disk you want to use below, follow the steps and read the log on the right :)")
-                            yield Static("")
-                            yield Static("Target disk (e.g. /dev/nvme0n1 or /dev/sda):")
+                            yield Static(
+                                "Welcome to the T2 Arch Linux Installer!\n"
+                                "\n"
+                                "Start by entering the disk you want to use below, follow the steps and read the log on the right :)\n"
+                                "\n"
+                                "Target disk (e.g. /dev/nvme0n1 or /dev/sda):"
+                            )
                             yield Input(placeholder="Enter disk path", id="disk_input")
-                            yield Static("Use 'Prepare Partitions' to create Linux partitions in the free space you set aside in macOS.")
-                            yield Static("Your macOS and other existing partitions will not be touched.")
-                            yield Static("")
-                            yield Static("If you already prepared these Linux partitions, you can skip this step by choosing 'Mount Existing'.")
-                            yield Static("")
-                            yield Static("Installation mode:")
+                            yield Static(
+                                "Use 'Prepare Partitions' to create Linux partitions in the free space you set aside in macOS.\n"
+                                "Your macOS and other existing partitions will not be touched.\n"
+                                "\n"
+                                "If you already prepared these Linux partitions, you can skip this step by choosing 'Mount Existing'.\n"
+                                "\n"
+                                "Installation mode:"
+                            )
                             yield Button("Prepare Partitions", id="partition_btn")
                             yield Button("Mount Existing", id="mount_btn")
                             yield Button("Already Installed (Run commands on the current system)", id="post_install_btn")
@@ -151,10 +548,12 @@ class T2ArchInstaller(App):
                                 yield RadioButton("btrfs", id="btrfs_plain", value=True)
                                 yield RadioButton("ext4 with LVM", id="ext4_lvm")
                                 yield RadioButton("ext4 (plain)", id="ext4_plain")
-                            yield Static("Partitioning will create:")
-                            yield Static("• EFI partition (1GB)")
-                            yield Static("• Swap partition (4GB, optional)")
-                            yield Static("• Root partition (remaining)")
+                            yield Static(
+                                "Partitioning will create:\n"
+                                "• EFI partition (1GB)\n"
+                                "• Swap partition (4GB, optional)\n"
+                                "• Root partition (remaining)"
+                            )
                             with RadioSet(id="partition_mode"):
                                 yield RadioButton("Create partitions", id="partition_without_swap")
                                 yield RadioButton("Create partitions, with swap", id="partition_with_swap", value=True)
@@ -163,9 +562,11 @@ class T2ArchInstaller(App):
 
                     with TabPane("Mount", id="mount_tab"):
                         with VerticalScroll(id="mount_scroll", can_focus=False):
-                            yield Static("Check the available partitions in the console and fill your preferences here:")
-                            yield Static("")
-                            yield Static("Root partition:")
+                            yield Static(
+                                "Check the available partitions in the console and fill your preferences here:\n"
+                                "\n"
+                                "Root partition:"
+                            )
                             yield Input(placeholder="e.g. /dev/nvme0n1p3 or /dev/sda3", id="root_input")
                             yield Static("EFI partition:")
                             yield Input(placeholder="e.g. /dev/nvme0n1p1 or /dev/sda1", id="efi_input")
@@ -175,13 +576,14 @@ class T2ArchInstaller(App):
 
                     with TabPane("Locale", id="time_tab"):
                         with VerticalScroll(id="time_scroll", can_focus=False):
-                            yield Static("Configure the system timezone:")
-                            yield Static("")
-                            yield Static("Timezone (e.g. America/New_York):")
+                            yield Static(
+                                "Configure the system timezone:\n"
+                                "\n"
+                                "Timezone (e.g. America/New_York):"
+                            )
                             yield Input(placeholder="Enter timezone", id="timezone_input")
                             yield Button("Set Timezone", id="set_timezone_btn")
-                            yield Static("Configure the system locale and language:")
-                            yield Static("")
+                            yield Static("Configure the system locale and language:\n")
                             yield Static("Available: en_US.UTF-8", id="locales_available")
                             yield Static("Additional locales (space/comma separated):")
                             yield Input(placeholder="en_GB.UTF-8 en_AU.UTF-8", id="locales_input")
@@ -213,6 +615,10 @@ class T2ArchInstaller(App):
                             yield Input(placeholder="Enter root password", password=True, id="root_password_input")
                             yield Button("Set Root Password", id="set_root_password_btn")
                             yield Button("Configure Sudoers", id="config_sudo_btn")
+                            yield Static("Boot animation (can also be added later from the Boot tab):")
+                            with RadioSet(id="plymouth_choice"):
+                                yield RadioButton("Don't add Plymouth", id="plymouth_off", value=True)
+                                yield RadioButton("Add Plymouth", id="plymouth_on")
                             yield Button("Build Initramfs", id="build_initramfs_btn")
 
                     with TabPane("Boot", id="boot_tab"):
@@ -229,9 +635,11 @@ class T2ArchInstaller(App):
 
                     with TabPane("Desktop", id="desktop_tab"):
                         with VerticalScroll(id="desktop_scroll", can_focus=False):
-                            yield Static("Create your user and install your preferred desktop environment or window manager.")
-                            yield Static("")
-                            yield Static("Username:")
+                            yield Static(
+                                "Create your user and install your preferred desktop environment or window manager.\n"
+                                "\n"
+                                "Username:"
+                            )
                             yield Input(placeholder="Enter username", id="username_input")
                             yield Static("User password:")
                             yield Input(placeholder="Enter user password", password=True, id="user_password_input")
@@ -249,8 +657,10 @@ class T2ArchInstaller(App):
 
                     with TabPane("Extras", id="extras_tab"):
                         with VerticalScroll(id="extras_scroll", can_focus=False):
-                            yield Static("Install additional (optional) packages and tweaks")
-                            yield Static("These include ffmpeg, pipewire, ghostty and fastfetch.")
+                            yield Static(
+                                "Install additional (optional) packages and tweaks\n"
+                                "These include ffmpeg, pipewire, ghostty and fastfetch."
+                            )
                             yield Button("Install Extra packages", id="extras_btn")
                             yield Button("Install tiny-dfr (for better TouchBar support)", id="tiny_dfr_btn")
                             yield Button("Add Sl's Arch Repository to Pacman", id="add_slsrepo_btn")
@@ -264,10 +674,12 @@ class T2ArchInstaller(App):
 
                     with TabPane("Completion", id="completion_tab"):
                         with VerticalScroll(id="completion_scroll", can_focus=False):
-                            yield Static("Installation Complete!")
-                            yield Static("Your Arch Linux T2 system has been successfully installed.")
-                            yield Static("The system is now ready to boot.")
-                            yield Static("Choose an option:")
+                            yield Static(
+                                "Installation Complete!\n"
+                                "Your Arch Linux T2 system has been successfully installed.\n"
+                                "The system is now ready to boot.\n"
+                                "Choose an option:"
+                            )
                             yield Button("Unmount Only", id="unmount_btn")
                             yield Button("Unmount & Reboot", id="reboot_btn")
                             yield Button("Unmount & Shutdown", id="shutdown_btn")
@@ -280,7 +692,14 @@ class T2ArchInstaller(App):
         """Initialize the application and asynchronously refresh any already-mounted target filesystem state."""
         self.title = "T2 Arch Linux Installer"
 
-        console = self.query_one("#console", RichLog)
+        # These widgets are used by nearly every step, so look them up once.
+        self._console = self.query_one("#console", RichLog)
+        self._tabs = self.query_one("#main_tabs", TabbedContent)
+        self._left_panel = self.query_one("#left_panel", Vertical)
+        self._tab_switcher = self._tabs.query_one("Tabs")
+        self._partition_info = self.query_one("#partition_info", Static)
+        self._locales_available = self.query_one("#locales_available", Static)
+        console = self._console
         console.write("T2 Arch Linux Installer Started")
         console.write("=" * 50)
         console.write("Follow the steps using the Tab key, the arrow keys on the switcher above or by pressing the keyboard shortcuts listed below.\n")
@@ -295,11 +714,15 @@ class T2ArchInstaller(App):
                 text=True,
                 timeout=10,
             )
-            for line in lsblk_output.splitlines():
-                console.write(line)
+            console.write(Text(lsblk_output.rstrip("\n")))
         except Exception as e:
             console.write(f"[WARN] Failed to get lsblk output: {e}")
 
+        # Report missing install tools once up front rather than partway through an install.
+        missing_tools = [tool for tool in INSTALL_TOOLS if shutil.which(tool) is None]
+        if missing_tools:
+            console.write(f"[WARN] Not found on this system: {', '.join(missing_tools)}. Install steps that use them will fail.")
+
         try:
             source, fstype = await self.refresh_target_root_storage(log_warnings=False)
             if fstype:
@@ -312,190 +735,364 @@ class T2ArchInstaller(App):
             console.write(f"[WARN] Failed to detect an existing target root filesystem at startup: {e}")
 
         self._enable_horizontal_button_scroll()
+        # Command output is queued by run_command and written to the console at most ~30 times per second.
+        self.set_interval(1 / 30, self._flush_log_tick)
 
     def _enable_horizontal_button_scroll(self) -> None:
         """Enable horizontal scrolling on all tab scroll views so buttons are never truncated."""
-        for scroll_id in [
-            "start_scroll",
-            "partition_scroll",
-            "mount_scroll",
-            "time_scroll",
-            "packages_scroll",
-            "system_scroll",
-            "boot_scroll",
-            "desktop_scroll",
-            "extras_scroll",
-            "completion_scroll",
-        ]:
-            scroll_view = self.query_one(f"#{scroll_id}", VerticalScroll)
+        # Every tab wraps its content in exactly one VerticalScroll, so a single query finds them all.
+        for scroll_view in self.query("#main_tabs TabPane > VerticalScroll"):
             scroll_view.styles.overflow_x = "auto"
             for btn in scroll_view.query(Button):
                 btn.styles.min_width = len(str(btn.label)) + 4
 
     def enable_post_install_scroll_views(self) -> None:
         """Enable scrollbars for longer tabs when post-install mode is active."""
-        for scroll_id in [
-            "start_scroll",
-            "partition_scroll",
-            "mount_scroll",
-            "time_scroll",
-            "packages_scroll",
-            "system_scroll",
-            "boot_scroll",
-            "desktop_scroll",
-            "extras_scroll",
-            "completion_scroll",
-        ]:
-            scroll_view = self.query_one(f"#{scroll_id}", VerticalScroll)
+        # Button widths were already fixed up on mount by _enable_horizontal_button_scroll.
+        for scroll_view in self.query("#main_tabs TabPane > VerticalScroll"):
             scroll_view.can_focus = True
             scroll_view.add_class("post-install-scroll")
             scroll_view.styles.overflow_x = "auto"
             scroll_view.styles.overflow_y = "auto"
-            for btn in scroll_view.query(Button):
-                btn.styles.min_width = len(str(btn.label)) + 4
             scroll_view.refresh(layout=True)
 
     def action_switch_tab(self, index: int) -> None:
         """Handles key bindings by directly setting the active tab."""
-        tabs = self.query_one(TabbedContent)
+        tabs = self._tabs
         if 0 <= index < len(self.tab_ids):
             tabs.active = self.tab_ids[index]
 
+    def show_tab(self, tab_id: str) -> None:
+        """Move focus back to the left panel and switch to the given tab."""
+        self._left_panel.focus()
+        self._tabs.active = tab_id
+
     def maybe_redirect_completion_from_extras(self) -> None:
         """Redirect to completion only once for extras actions, while restoring focus."""
-        left_panel = self.query_one("#left_panel")
+        left_panel = self._left_panel
         focus_was_cleared = self.screen.focused is None
         first_extras_redirect = not self.extras_completion_redirected
         if not first_extras_redirect:
             if focus_was_cleared:
                 left_panel.focus()
-                self.query_one("#main_tabs").query_one("Tabs").focus()
+                self._tab_switcher.focus()
             return
-        left_panel.focus()
-        self.query_one(TabbedContent).active = "completion_tab"
+        self.show_tab("completion_tab")
         self.extras_completion_redirected = True
 
-    async def run_command(self, command: str, timeout: int = 300) -> bool:
-        """Run a shell command and display its output in the console."""
-        console = self.query_one("#console", RichLog)
-        console.write(f"➜ {command}")
-        original_command = command
-        process: Optional[asyncio.subprocess.Process] = None
-
-        def wrap_for_streaming(cmd: str) -> str:
-            """Ensure the subprocess sees a pseudo-terminal when needed."""
-            stripped = cmd.lstrip()
+    def _widget(self, widget_id: str, expect_type: type[WidgetT] = Widget) -> WidgetT:
+        """Return the widget with the given id, looking it up only once."""
+        widget = self._widgets.get(widget_id)
+        if widget is None:
+            widget = self._widgets[widget_id] = self.query_one(f"#{widget_id}", expect_type)
+        return widget
+
+    def _input(self, input_id: str) -> Input:
+        """Return the Input widget with the given id, looking it up only once."""
+        return self._widget(input_id, Input)
+
+    def _queue_log(self, line: str) -> None:
+        """Queue a console line so bursts of command output are rendered in one write."""
+        self._log_batch.append(line)
+        if len(self._log_batch) >= 2000:
+            self._flush_log()
+
+    def _flush_log(self) -> None:
+        """Write all queued console lines as a single RichLog update."""
+        if not self._log_batch:
+            return
+        self._console.write(Text("\n".join(self._log_batch)))
+        self._log_batch.clear()
+        self._last_log_flush = time.monotonic()
 
-            # Avoid double wrapping if the caller already provided a stdbuf wrapper.
-            if stripped.startswith("stdbuf "):
-                return cmd
+    def _flush_log_tick(self) -> None:
+        """Timer callback: flush the log, less often the longer the current command has been running."""
+        if not self._log_batch:
+            return
+        now = time.monotonic()
+        if self._command_started is not None:
+            elapsed = now - self._command_started
+            # ~30 fps for the first 30 s, then 4 fps, then once a second after 5 minutes (pacstrap, mkinitcpio).
+            interval = 1 / 30 if elapsed < 30 else 0.25 if elapsed < 300 else 1.0
+            if now - self._last_log_flush < interval:
+                return
+        self._flush_log()
 
-            # Fallback to stdbuf to reduce buffering for regular commands.
-            return f"stdbuf -oL -eL {cmd}"
+    async def show_disk_layout(self, disk: str) -> None:
+        """Print lsblk -p for a disk. Always queried fresh, since disks can change outside the app."""
+        log = self._queue_log
+        log(f"➜ lsblk -p {disk}")
+        try:
+            output = await asyncio.to_thread(
+                subprocess.check_output, ["lsblk", "-p", disk], text=True, stderr=subprocess.STDOUT, timeout=10
+            )
+        except subprocess.CalledProcessError as e:
+            log(f"  [ERROR] {e.output.strip() or e}")
+            return
+        except (OSError, subprocess.TimeoutExpired) as e:
+            log(f"  [ERROR] Failed to run lsblk: {e}")
+            return
+        for line in output.splitlines():
+            log(f"  {line}")
+        self._flush_log()
+
+    async def run_command(
+        self,
+        command: Union[str, list[str]],
+        timeout: int = 300,
+        input: Optional[str] = None,
+        display: Optional[str] = None,
+    ) -> bool:
+        """
+        Run a command and display its output in the console.
+        Plain commands are executed directly; anything using shell syntax goes through /bin/sh.
+        A list of commands runs as one bash script that stops at the first failing command.
+        If input is given it is written to the command's stdin, otherwise stdin is /dev/null.
+        display replaces the echoed command line when the real one is not readable.
+        """
+        if not isinstance(command, str):
+            if display is None:
+                listing = "\n".join(command)
+                display = f"bash <<'EOF'\n{listing}\nEOF"
+            command = f"bash -c {shlex.quote(_batch_script(command))}"
+        # Everything run_command prints goes through the batched log so it stays in order.
+        log = self._queue_log
+        if display is not None:
+            log(f"➜ {display}")
+        elif input is None:
+            log(f"➜ {command}")
+        else:
+            log(f"➜ {command} <<'EOF'\n{input.rstrip()}\nEOF")
+        original_command = command
+        process: Optional[asyncio.subprocess.Process] = None
+        self._command_started = time.monotonic()
 
-        def needs_pacman_cleanup(cmd: str) -> bool:
-            cmd_lower = cmd.lower()
-            return "pacman" in cmd_lower or "pacstrap" in cmd_lower
+        try:
+            stdin = asyncio.subprocess.DEVNULL if input is None else asyncio.subprocess.PIPE
+
+            # stdbuf keeps line buffering on the pipe; it is skipped if the caller already added it.
+            argv = _split_simple_command(original_command)
+            if argv is not None:
+                if argv[0] != "stdbuf":
+                    argv = ["stdbuf", "-oL", "-eL", *argv]
+                process = await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdin=stdin,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    preexec_fn=os.setsid,
+                )
+            else:
+                streaming_command = original_command
+                if not streaming_command.lstrip().startswith("stdbuf "):
+                    streaming_command = f"stdbuf -oL -eL {streaming_command}"
+                process = await asyncio.create_subprocess_shell(
+                    streaming_command,
+                    stdin=stdin,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT,
+                    preexec_fn=os.setsid,
+                )
 
-        def terminate_process(proc: asyncio.subprocess.Process) -> None:
-            if proc is None:
-                return
-            try:
-                os.killpg(proc.pid, signal.SIGKILL)
-            except Exception:
+            if input is not None and process.stdin is not None:
+                process.stdin.write(input.encode("utf-8"))
                 try:
-                    proc.kill()
-                except Exception:
+                    await process.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
                     pass
-
-        try:
-            streaming_command = wrap_for_streaming(original_command)
-            loop = asyncio.get_running_loop()
-            start_time = loop.time()
-
-            process = await asyncio.create_subprocess_shell(
-                streaming_command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.STDOUT,
-                preexec_fn=os.setsid,
-            )
+                process.stdin.close()
 
             if process.stdout is None:
-                console.write("  [ERROR] Failed to capture command output")
-                terminate_process(process)
-                if needs_pacman_cleanup(original_command):
+                log("  [ERROR] Failed to capture command output")
+                await _terminate_process(process)
+                if _needs_pacman_cleanup(original_command):
                     await self.cleanup_pacman_lock()
                 return False
 
-            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
-            buffer = ""
+            def write_output_line(raw: bytes) -> None:
+                # Lines are split on ASCII "\n"/"\r", so each one decodes independently as UTF-8.
+                rendered = raw.decode("utf-8", "replace")
+                # Most lines carry no trailing whitespace, so only strip when there is some.
+                if rendered and rendered[-1].isspace():
+                    rendered = rendered.rstrip()
+                log("  " + rendered if rendered else "")
+
+            async def drain(stream: asyncio.StreamReader) -> None:
+                # read() only wakes up when the child writes something or closes the pipe.
+                pending = bytearray()
+                while data := await stream.read(4096):
+                    pending += data
+                    # Progress bars (pacman, pacstrap) redraw with "\r", so treat it as a line break too.
+                    cut = max(pending.rfind(b"\n"), pending.rfind(b"\r"))
+                    if cut < 0:
+                        continue
+                    for line in pending[:cut].replace(b"\r", b"\n").split(b"\n"):
+                        write_output_line(line)
+                    del pending[:cut + 1]
+                if pending:
+                    write_output_line(pending)
 
-            while True:
-                if timeout is not None and (loop.time() - start_time) > timeout:
-                    console.write("  [ERROR] Command timed out")
-                    terminate_process(process)
-                    if needs_pacman_cleanup(original_command):
-                        await self.cleanup_pacman_lock()
-                    await process.wait()
-                    return False
-
-                try:
-                    data = await asyncio.wait_for(process.stdout.read(4096), timeout=0.1)
-                except asyncio.TimeoutError:
-                    continue
-                except Exception as e:
-                    console.write(f"  [ERROR] Exception reading output: {e}")
-                    terminate_process(process)
-                    if needs_pacman_cleanup(original_command):
-                        await self.cleanup_pacman_lock()
-                    await process.wait()
-                    return False
-
-                if data:
-                    buffer += decoder.decode(data).replace("\r", "\n")
-                    while "\n" in buffer:
-                        line, buffer = buffer.split("\n", 1)
-                        rendered = line.rstrip()
-                        if rendered:
-                            console.write(f"  {rendered}")
-                        else:
-                            console.write("")
-                else:
-                    break
-
-            buffer += decoder.decode(b"", final=True).replace("\r", "\n")
-            if buffer:
-                for line in buffer.split("\n"):
-                    rendered = line.rstrip()
-                    if rendered:
-                        console.write(f"  {rendered}")
-                    elif line:
-                        console.write("")
+            try:
+                await asyncio.wait_for(drain(process.stdout), timeout)
+            except asyncio.TimeoutError:
+                log("  [ERROR] Command timed out")
+                await _terminate_process(process)
+                if _needs_pacman_cleanup(original_command):
+                    await self.cleanup_pacman_lock()
+                return False
+            except Exception as e:
+                log(f"  [ERROR] Exception reading output: {e}")
+                await _terminate_process(process)
+                if _needs_pacman_cleanup(original_command):
+                    await self.cleanup_pacman_lock()
+                return False
 
             await process.wait()
 
             if process.returncode != 0:
-                console.write(f"  [ERROR] Command failed with exit code {process.returncode}")
-                if needs_pacman_cleanup(original_command):
+                log(f"  [ERROR] Command failed with exit code {process.returncode}")
+                if _needs_pacman_cleanup(original_command):
                     await self.cleanup_pacman_lock()
                 return False
             return True
         except Exception as e:
-            console.write(f"  [ERROR] Exception: {str(e)}")
-            if needs_pacman_cleanup(original_command):
+            log(f"  [ERROR] Exception: {str(e)}")
+            if _needs_pacman_cleanup(original_command):
                 await self.cleanup_pacman_lock()
             return False
+        finally:
+            self._command_started = None
+            self._flush_log()
+
+    async def run_in_chroot(
+        self,
+        inner_cmd: Union[str, list[str]],
+        timeout: int = 300,
+        input: Optional[str] = None,
+        display: Optional[str] = None,
+    ) -> bool:
+        """
+        Run a command in the target system, or on the current system in post-install mode.
+        A list of commands runs as one bash script that stops at the first failing command;
+        input is then never echoed, since the script listing is shown instead.
+        """
+        if isinstance(inner_cmd, str):
+            if self.post_install_mode:
+                return await self.run_command(inner_cmd, timeout=timeout, input=input, display=display)
+            if not self._is_chroot_ready():
+                console = self._console
+                console.write("[ERROR] Chroot is not ready - run pacstrap first.")
+                return False
+            wrapped_inner = f"stdbuf -oL -eL {inner_cmd}"
+            chroot_cmd = f"arch-chroot /mnt bash -lc {shlex.quote(wrapped_inner)}"
+            if display is not None:
+                display = f"arch-chroot /mnt {display}"
+            return await self.run_command(chroot_cmd, timeout=timeout, input=input, display=display)
 
-    async def run_in_chroot(self, inner_cmd: str, timeout: int = 300) -> bool:
         if self.post_install_mode:
-            return await self.run_command(inner_cmd, timeout=timeout)
+            return await self.run_command(inner_cmd, timeout=timeout, input=input)
         if not self._is_chroot_ready():
-            console = self.query_one("#console", RichLog)
-            console.write("[ERROR] Chroot is not ready - run pacstrap first.")
+            self._console.write("[ERROR] Chroot is not ready - run pacstrap first.")
+            return False
+        script = _batch_script(inner_cmd)
+        listing = "\n".join(inner_cmd)
+        # stdbuf's settings are inherited through the environment, so one wrapper covers every command.
+        return await self.run_command(
+            f"arch-chroot /mnt stdbuf -oL -eL bash -lc {shlex.quote(script)}",
+            timeout=timeout,
+            input=input,
+            display=f"arch-chroot /mnt bash <<'EOF'\n{listing}\nEOF",
+        )
+
+    async def install_packages(self, packages: Iterable[str], timeout: int = 600) -> bool:
+        """
+        Install packages in the target system with one pacman transaction.
+        The transaction is skipped when the target's package database already lists all of them,
+        and parallel downloads are enabled in the target's pacman.conf before the first install.
+        """
+        target_root = self._get_target_root()
+        packages = list(dict.fromkeys(packages))
+        if await self.packages_installed(packages):
+            return True
+        # Make sure pacman fetches packages in parallel, once per root. Only recorded when it worked,
+        # and not attempted before pacstrap (run_in_chroot reports that). Not fatal, like in configure_t2_repository.
+        if target_root not in self._pacman_prepared and self._is_chroot_ready():
+            if self.ensure_parallel_downloads(target_root):
+                self._pacman_prepared.add(target_root)
+        return await self.run_in_chroot(f"pacman -S --noconfirm --needed {' '.join(packages)}", timeout=timeout)
+
+    async def packages_installed(self, packages: Iterable[str]) -> bool:
+        """
+        Return whether the target's local pacman database has every one of packages.
+        Queried from the host with --dbpath, so no arch-chroot is needed; groups never match.
+        """
+        dbpath = os.path.join(self._get_target_root(), "var/lib/pacman")
+        if not shutil.which("pacman") or not os.path.isdir(os.path.join(dbpath, "local")):
+            return False
+        try:
+            probe = await asyncio.create_subprocess_exec(
+                "pacman", "--dbpath", dbpath, "-Q", *packages,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            return await probe.wait() == 0
+        except OSError:
+            return False
+
+    def write_target_file(self, path: str, content: str, mode: Optional[int] = None, append: bool = False) -> bool:
+        """
+        Write (or append to) a file inside the target system (the current system in post-install mode).
+        Parent directories are created only if the first open fails; mode is applied only
+        when given, since files on the FAT ESP cannot be chmod-ed.
+        """
+        if not self.post_install_mode and not self._is_chroot_ready():
+            self._console.write("[ERROR] Chroot is not ready - run pacstrap first.")
+            return False
+        full_path = os.path.join(self._get_target_root(), path.lstrip("/"))
+        flags = os.O_WRONLY | os.O_CREAT | os.O_CLOEXEC | (os.O_APPEND if append else os.O_TRUNC)
+        create_mode = 0o666 if mode is None else mode
+        try:
+            try:
+                fd = os.open(full_path, flags, create_mode)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                fd = os.open(full_path, flags, create_mode)
+            try:
+                data = memoryview(content.encode("utf-8"))
+                while data:
+                    data = data[os.write(fd, data):]
+                # The create mode is masked by umask and ignored for existing files, so set it explicitly.
+                if mode is not None:
+                    os.fchmod(fd, mode)
+            finally:
+                os.close(fd)
+            return True
+        except OSError as e:
+            self._console.write(f"[ERROR] Failed to write {path}: {e}")
+            return False
+
+    def rewrite_target_file(self, path: str, subs: Iterable[tuple[Union[str, re.Pattern], str]]) -> bool:
+        """
+        Apply (pattern, replacement) regex substitutions, line-anchored like sed, to a file in the
+        target system in one read and one write. The file is left untouched if nothing changes.
+        Precompiled patterns are used as given, so they should be compiled with re.M.
+        """
+        full_path = os.path.join(self._get_target_root(), path.lstrip("/"))
+        try:
+            with open(full_path, "r", encoding="utf-8") as f:
+                original = f.read()
+        except OSError as e:
+            self._console.write(f"[ERROR] Failed to read {path}: {e}")
             return False
-        wrapped_inner = f"stdbuf -oL -eL {inner_cmd}"
-        chroot_cmd = f"arch-chroot /mnt bash -lc {shlex.quote(wrapped_inner)}"
-        return await self.run_command(chroot_cmd, timeout=timeout)
+        content = original
+        for pattern, repl in subs:
+            if isinstance(pattern, str):
+                pattern = re.compile(pattern, re.M)
+            content = pattern.sub(repl, content)
+        if content == original:
+            return True
+        return self.write_target_file(path, content)
 
     def _is_chroot_ready(self) -> bool:
         """Check if the chroot at /mnt has a usable base system."""
@@ -574,29 +1171,29 @@ class T2ArchInstaller(App):
                     pass
                 except Exception as e:
                     if log_warnings:
-                        self.query_one("#console", RichLog).write(
+                        self._console.write(
                             f"[WARN] Failed to stop the timed-out block-device probe ({' '.join(probe_cmd)}): {e}"
                         )
                 try:
                     await asyncio.wait_for(probe.wait(), timeout=5)
                 except Exception as e:
                     if log_warnings:
-                        self.query_one("#console", RichLog).write(
+                        self._console.write(
                             f"[WARN] Timed-out block-device probe did not exit cleanly ({' '.join(probe_cmd)}): {e}"
                         )
             if log_warnings:
-                self.query_one("#console", RichLog).write(
+                self._console.write(
                     f"[WARN] Timed out while probing the target root block device ({' '.join(probe_cmd)})."
                 )
             return ""
         except OSError as e:
             if log_warnings:
-                self.query_one("#console", RichLog).write(f"[WARN] Could not probe the target root block device: {e}")
+                self._console.write(f"[WARN] Could not probe the target root block device: {e}")
             return ""
 
         if probe.returncode != 0:
             if log_warnings:
-                self.query_one("#console", RichLog).write(
+                self._console.write(
                     f"[WARN] Block-device probe exited with code {probe.returncode}: {stderr.decode().strip()}"
                 )
             return ""
@@ -634,29 +1231,29 @@ class T2ArchInstaller(App):
                     pass
                 except Exception as e:
                     if log_warnings:
-                        self.query_one("#console", RichLog).write(
+                        self._console.write(
                             f"[WARN] Failed to stop the timed-out filesystem probe ({' '.join(probe_cmd)}): {e}"
                         )
                 try:
                     await asyncio.wait_for(probe.wait(), timeout=5)
                 except Exception as e:
                     if log_warnings:
-                        self.query_one("#console", RichLog).write(
+                        self._console.write(
                             f"[WARN] Timed-out filesystem probe did not exit cleanly ({' '.join(probe_cmd)}): {e}"
                         )
             if log_warnings:
-                self.query_one("#console", RichLog).write(
+                self._console.write(
                     f"[WARN] Timed out while probing the target root filesystem ({' '.join(probe_cmd)})."
                 )
             return "", ""
         except OSError as e:
             if log_warnings:
-                self.query_one("#console", RichLog).write(f"[WARN] Could not probe the target root filesystem: {e}")
+                self._console.write(f"[WARN] Could not probe the target root filesystem: {e}")
             return "", ""
 
         if probe.returncode != 0:
             if log_warnings:
-                self.query_one("#console", RichLog).write(
+                self._console.write(
                     f"[WARN] Filesystem probe exited with code {probe.returncode}: {stderr.decode().strip()}"
                 )
             return "", ""
@@ -669,7 +1266,7 @@ class T2ArchInstaller(App):
         source = re.sub(r"\[[^]]*\]$", "", parts[0]) if parts else ""
         fstype = parts[1].lower() if len(parts) > 1 else ""
         if source and not fstype and log_warnings:
-            self.query_one("#console", RichLog).write(
+            self._console.write(
                 f"[WARN] Root filesystem probe returned no filesystem type ({' '.join(probe_cmd)})."
             )
         if fstype:
@@ -689,7 +1286,7 @@ class T2ArchInstaller(App):
         if fstype:
             return fstype == "btrfs"
         if log_warnings:
-            self.query_one("#console", RichLog).write(
+            self._console.write(
                 "[WARN] Could not confirm the target root filesystem; skipping Btrfs-specific actions."
             )
         return False
@@ -725,29 +1322,31 @@ class T2ArchInstaller(App):
             }.get(event.pressed.id, "grub")
         elif event.radio_set.id == "partition_mode":
             self.partition_mode = event.pressed.id
+        elif event.radio_set.id == "plymouth_choice":
+            self.use_plymouth = event.pressed.id == "plymouth_on"
 
     @on(Button.Pressed)
     async def on_button_pressed(self, event: Button.Pressed):
         """Handle button presses."""
         button_id = event.button.id
-        console = self.query_one("#console", RichLog)
-        tabs = self.query_one(TabbedContent)
+        console = self._console
+        tabs = self._tabs
 
         # Blur the button before changing the tab, to avoid tab switching issues.
         self.screen.set_focus(None)
 
         if button_id == "partition_btn":
-            self.disk = self.query_one("#disk_input", Input).value.strip()
+            self.disk = self._input("disk_input").value.strip()
             if self.disk:
-                await self.run_command(f"lsblk -p {self.disk}")
-                self.query_one("#partition_info", Static).update(f"Disk: {self.disk}")
+                await self.show_disk_layout(self.disk)
+                self._partition_info.update(f"Disk: {self.disk}")
                 tabs.active = "partition_tab"
             else:
                 console.write("[ERROR] Please enter a disk path first")
         elif button_id == "mount_btn":
-            self.disk = self.query_one("#disk_input", Input).value.strip()
+            self.disk = self._input("disk_input").value.strip()
             if self.disk:
-                await self.run_command(f"lsblk -p {self.disk}")
+                await self.show_disk_layout(self.disk)
                 tabs.active = "mount_tab"
             else:
                 console.write("[ERROR] Please enter a disk path first")
@@ -761,57 +1360,48 @@ class T2ArchInstaller(App):
                     f"[INFO] Detected current root filesystem: {self.format_detected_filesystem_label(fstype)} ({source})"
                 )
             tabs.active = "time_tab"
-        elif button_id == "create_partitions_btn": await self.create_partitions()
-        elif button_id == "mount_partitions_btn": await self.mount_partitions()
-        elif button_id == "set_timezone_btn": await self.set_timezone()
-        elif button_id == "add_locales_btn": self.add_locales()
-        elif button_id == "set_language_btn": await self.set_language()
-        elif button_id == "add_repo_btn": await self.add_t2_repository()
-        elif button_id == "pacstrap_auto_btn": await self.install_base_system_auto()
-        elif button_id == "pacstrap_manual_btn": await self.install_base_system_manual()
-        elif button_id == "fstab_btn": await self.generate_fstab()
-        elif button_id == "chroot_repo_btn": await self.add_t2_repo_to_chroot()
-        elif button_id == "config_basic_btn": await self.configure_basic_system()
-        elif button_id == "set_hostname_btn": await self.set_hostname()
-        elif button_id == "set_root_password_btn": await self.set_root_password()
-        elif button_id == "config_sudo_btn": await self.configure_sudoers()
-        elif button_id == "build_initramfs_btn": await self.build_initramfs()
-        elif button_id == "install_bootloader_btn":
-            if self.bootloader_type == "grub":
-                await self.install_grub()
-            elif self.bootloader_type == "limine":
-                await self.install_limine()
-            else:
-                await self.install_systemd_boot()
-        elif button_id == "boot_icon_btn": await self.create_boot_icon()
-        elif button_id == "boot_label_btn": await self.create_boot_label()
-        elif button_id == "plymouth_btn": await self.install_plymouth()
-        elif button_id == "create_user_btn": await self.create_user_and_services()
         elif button_id == "no_de_btn":
             console.write("No desktop environment selected")
             tabs.active = "extras_tab"
-        elif button_id in ["gnome_auto_btn", "gnome_manual_btn", "kde_auto_btn", "kde_manual_btn", "cosmic_auto_btn", "niri_auto_btn", "niridms_auto_btn"]:
-            de_type = button_id.split("_", 1)[0] # "gnome"|"kde"|"cosmic"|""|"niri"|"niridms"
-            is_manual = "manual" in button_id
+        elif button_id in self.DE_BUTTONS:
+            de_type, is_manual = self.DE_BUTTONS[button_id]
             await self.install_desktop_environment(de_type, is_manual)
-        elif button_id == "extras_btn": await self.install_extras()
-        elif button_id == "tiny_dfr_btn": await self.install_tiny_dfr()
         elif button_id == "add_slsrepo_btn":
             if await self.add_slsrepo_to_chroot():
                 self.maybe_redirect_completion_from_extras()
             else:
-                self.query_one("#add_slsrepo_btn").focus()
-        elif button_id == "enable_hybrid_graphics_btn":
-            await self.enable_hybrid_graphics()
-        elif button_id == "recurring_network_notifications_fix_btn":
-            await self.recurring_network_notifications_fix()
-        elif button_id == "suspend_sleep_btn": await self.disable_suspend_sleep()
-        elif button_id == "ignore_lid_btn": await self.ignore_lid_switch()
-        elif button_id == "suspend_fix_btn": await self.install_suspend_fix()
-        elif button_id == "extended_suspend_fix_btn": await self.install_extended_suspend_fix()
-        elif button_id == "unmount_btn": await self.unmount_system()
-        elif button_id == "reboot_btn": await self.reboot_system()
-        elif button_id == "shutdown_btn": await self.shutdown_system()
+                self._widget("add_slsrepo_btn").focus()
+        elif (handler := self._button_handlers.get(button_id)) is not None:
+            # A few steps (add_locales, install_base_system_manual) are plain functions.
+            result = handler()
+            if inspect.isawaitable(result):
+                await result
+
+    async def install_bootloader(self):
+        """Install the bootloader selected in the Boot tab."""
+        if self.bootloader_type == "grub":
+            await self.install_grub()
+        elif self.bootloader_type == "limine":
+            await self.install_limine()
+        else:
+            await self.install_systemd_boot()
+
+    def _detect_hidpi(self) -> bool:
+        """Return whether the framebuffer looks like a HiDPI screen, reading sysfs only once."""
+        if self._hidpi is None:
+            # Read framebuffer virtual size to detect HiDPI. Treat >= 3000x or >= 2000y as HiDPI.
+            try:
+                fd = os.open("/sys/class/graphics/fb0/virtual_size", os.O_RDONLY)
+                try:
+                    data = os.read(fd, 64)
+                finally:
+                    os.close(fd)
+                w, h = (int(x) for x in data.split(b","))
+                self._hidpi = w >= 3000 or h >= 2000
+            except (OSError, ValueError):
+                # No framebuffer (or an unexpected format): remember the answer rather than retrying.
+                self._hidpi = False
+        return self._hidpi
 
     async def set_smart_font(self) -> bool:
         """
@@ -819,28 +1409,18 @@ class T2ArchInstaller(App):
         Otherwise, leave the current console font unchanged.
         Returns True if we changed the font, False if we did nothing or failed.
         """
-        # Read framebuffer virtual size to detect HiDPI. Treat >= 3000x or >= 2000y as HiDPI.
-        hidpi = False
-        try:
-            with open("/sys/class/graphics/fb0/virtual_size") as f:
-                w, h = [int(x) for x in f.read().strip().split(",")]
-                hidpi = (w >= 3000 or h >= 2000)
-        except Exception:
-            return False
-
-        if not hidpi:
+        if not self._detect_hidpi() or not shutil.which("setfont"):
             return False
 
         # Apply the font (ter-132b for HiDPI screens)
         font_path = "ter-132b"
-        if await self.run_command(f"setfont {font_path}", timeout=10):
-            return True
-
-        return False
+        return await self.run_command(f"setfont {font_path}", timeout=10)
 
     async def cleanup_pacman_lock(self):
         """Clean up pacman lock file on errors."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
+        # Keep the cleanup message after any output still queued from the failed command.
+        self._flush_log()
         lock_path = os.path.join(self._get_target_root(), "var/lib/pacman/db.lck")
         if os.path.exists(lock_path):
             console.write("Cleaning up pacman lock file...")
@@ -859,9 +1439,20 @@ class T2ArchInstaller(App):
         suffix = self.detect_partition_suffix(disk)
         return (f"{disk}{suffix}1", f"{disk}{suffix}2", f"{disk}{suffix}3")
 
+    def _build_sfdisk_script(self, *, whole: bool, include_swap: bool, swap_mib: int = 4096) -> str:
+        """Build the sfdisk script for the EFI, optional swap and root partitions."""
+        # The root partition takes the remaining space; LVM uses its GPT type GUID.
+        root_type = "E6D6D379-F507-44C2-A23C-238F2A3DF928" if self.use_lvm else "linux"
+        return (
+            ("label: gpt\n" if whole else "")
+            + "size=1GiB, type=uefi\n"
+            + (f"size={swap_mib}MiB, type=swap\n" if include_swap else "")
+            + f"type={root_type}\n"
+        )
+
     async def create_partitions(self):
         """Create partitions based on the filesystem choice."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         if not self.disk:
             console.write("[ERROR] No disk specified")
             return
@@ -870,128 +1461,41 @@ class T2ArchInstaller(App):
         include_swap = True
         if mode == "partition_without_swap":
             include_swap = False
-        swap_mib = 4096
-
-        def _parts():
-            out = subprocess.check_output(
-                ["lsblk", "-bJ", "-o", "NAME,KNAME,SIZE,START,PARTTYPE,FSTYPE", self.disk],
-                text=True
-            )
-            data = json.loads(out)
-            dev = next(d for d in data["blockdevices"]
-                    if ("/dev/"+d["name"]) == self.disk or d["kname"] == self.disk)
-            ch = dev.get("children") or []
-            parts = [{
-                "name": c["name"],
-                "kname": "/dev/"+c["name"],
-                "size": int(c.get("size") or 0),
-                "start": int(c.get("start") or 0),
-                "parttype": (c.get("parttype") or "").lower(),
-                "fstype": (c.get("fstype") or "").lower(),
-            } for c in ch]
-            parts.sort(key=lambda p: p["start"])
-            return parts
-
-        def _is_partition_empty(kname):
-            """
-            Check if a partition is empty (no files or only filesystem metadata).
-            Returns True if empty, False if has data or cannot be determined.
-            """
-            # Validate kname to ensure it's a valid block device path
-            if not kname or not kname.startswith("/dev/"):
-                return False
 
-            mount_point = None
-            mounted = False
+        async def _parts() -> Optional[list]:
+            # Run lsblk off the event loop; -P prints one KEY="value" line per device.
             try:
-                # Create a secure temporary mount point
-                mount_point = tempfile.mkdtemp(prefix="partition_check_")
-
-                # Try to mount the partition read-only
-                mount_result = subprocess.run(
-                    ["mount", "-o", "ro", kname, mount_point],
-                    capture_output=True,
-                    text=True
+                out = await asyncio.to_thread(
+                    subprocess.check_output,
+                    ["lsblk", "-bnP", "-o", "NAME,TYPE,SIZE,START,PARTTYPE,FSTYPE", self.disk],
+                    text=True,
+                    stderr=subprocess.STDOUT,
                 )
+            except subprocess.CalledProcessError as e:
+                console.write(f"[ERROR] Could not list partitions on {self.disk}: {e.output.strip() or e}")
+                return None
+            except OSError as e:
+                console.write(f"[ERROR] Could not run lsblk: {e}")
+                return None
+            parts = []
+            for line in out.splitlines():
+                c = dict(_LSBLK_PAIR.findall(line))
+                if c.get("TYPE") != "part":
+                    continue
+                parts.append({
+                    "name": c["NAME"],
+                    "kname": "/dev/"+c["NAME"],
+                    "size": int(c.get("SIZE") or 0),
+                    "start": int(c.get("START") or 0),
+                    "parttype": c.get("PARTTYPE", "").lower(),
+                    "fstype": c.get("FSTYPE", "").lower(),
+                })
+            parts.sort(key=lambda p: p["start"])
+            return parts
 
-                if mount_result.returncode != 0:
-                    # Cannot mount, assume not empty for safety
-                    return False
-
-                # Mount succeeded
-                mounted = True
-
-                # Check contents
-                contents = os.listdir(mount_point)
-                # Consider filesystem metadata directories/files that are auto-created
-                metadata_items = {
-                    "lost+found",              # ext2/3/4 metadata
-                    "System Volume Information", # Windows metadata
-                    "$RECYCLE.BIN",            # Windows recycle bin
-                    ".Trashes",                # macOS trash
-                    ".fseventsd",              # macOS file system events
-                    ".Spotlight-V100",         # macOS Spotlight indexing
-                    ".TemporaryItems",         # macOS temporary items
-                    ".VolumeIcon.icns",        # macOS volume icon
-                    ".DS_Store",               # macOS Desktop Services Store
-                }
-                # Filter out known metadata - if anything else remains, partition has data
-                actual_contents = [item for item in contents if item not in metadata_items]
-                is_empty = len(actual_contents) == 0
-
-                return is_empty
-
-            except Exception:
-                # On any error, assume not empty for safety
-                return False
-            finally:
-                # Unmount if mounted
-                if mounted:
-                    subprocess.run(["umount", mount_point], check=False, capture_output=True)
-                # Clean up mount point if it was created
-                if mount_point:
-                    try:
-                        os.rmdir(mount_point)
-                    except Exception:
-                        pass
-
-        def _last_is_safe_to_delete(p):
-            """
-            Check if the last partition is safe to delete.
-            Only allow deletion of empty ExFAT partitions (created in macOS Disk Utility).
-            Never allow deletion of Mac partitions (APFS, HFS+) or partitions with data.
-            Prioritizes avoiding data loss at any cost.
-            """
-            # Check for Mac partition types (should never be deleted)
-            mac_partition_types = (
-                "7c3457ef-0000-11aa-aa11-00306543ecac",  # APFS
-                "48465300-0000-11aa-aa11-00306543ecac",  # HFS+
-            )
-            if p["parttype"] in mac_partition_types:
-                return False
-
-            # Check for Mac filesystems
-            if p["fstype"] in ("apfs", "hfsplus", "hfs"):
-                return False
-
-            # Only allow deletion of ExFAT partitions
-            exfat_partition_type = "ebd0a0a2-b9e5-4433-87c0-68b6b72699c7"
-            is_exfat = (
-                p["parttype"] == exfat_partition_type or
-                p["fstype"] in ("exfat", "vfat")
-            )
-
-            if not is_exfat:
-                # Not ExFAT - do not delete (includes Linux partitions)
-                return False
-
-            # ExFAT partition - check if it's empty before allowing deletion
-            if not _is_partition_empty(p["kname"]):
-                return False
-
-            return True
-
-        existing = _parts()
+        existing = await _parts()
+        if existing is None:
+            return
         auto_mode = "whole" if len(existing) == 0 else "add"
 
         # Track existing partition names to avoid formatting them later
@@ -999,50 +1503,36 @@ class T2ArchInstaller(App):
 
         if auto_mode == "whole":
             console.write("Creating partitions...")
-            lines = ["label: gpt",
-                    "size=1GiB, type=uefi"]
-            if include_swap:
-                lines.append(f"size={swap_mib}MiB, type=swap")
-            if self.use_lvm:
-                lines.append("type=E6D6D379-F507-44C2-A23C-238F2A3DF928")  # LVM GPT GUID type
-            else:
-                lines.append("type=linux")
-            script = "\n".join(lines) + "\n"
+            script = self._build_sfdisk_script(whole=True, include_swap=include_swap)
 
-            if not await self.run_command(f"sfdisk --wipe always {self.disk} <<'EOF'\n{script}EOF"):
+            if not await self.run_command(f"sfdisk --wipe always {shlex.quote(self.disk)}", input=script):
                 console.write("[ERROR] Partitioning failed.")
                 return
 
         else:
             console.write("Adding partitions at the end of the disk...")
-            append_lines = ["size=1GiB,type=uefi"]
-            if include_swap:
-                append_lines.append(f"size={swap_mib}MiB, type=swap")
-            if self.use_lvm:
-                append_lines.append("type=E6D6D379-F507-44C2-A23C-238F2A3DF928") # LVM GPT GUID type
-            else:
-                append_lines.append("type=linux")
-            script = "\n".join(append_lines) + "\n"
+            script = self._build_sfdisk_script(whole=False, include_swap=include_swap)
 
             ok = await self.run_command(
-                f"sfdisk --append {self.disk} <<'EOF'\n{script}EOF"
+                f"sfdisk --append {shlex.quote(self.disk)}", input=script
             )
 
             if not ok:
-                parts_before = _parts()
-                if not parts_before:
+                # A failed sfdisk run leaves the table untouched, so the listing from above is still current.
+                if not existing:
                     console.write("[ERROR] No existing partitions; use Whole drive mode.")
                     return
-                last = parts_before[-1]
-                if not _last_is_safe_to_delete(last):
+                last = existing[-1]
+                # The emptiness check mounts the partition, so keep it off the event loop.
+                if not await asyncio.to_thread(_last_is_safe_to_delete, last):
                     console.write("[ERROR] Not enough free tail space and last partition is not an empty ExFAT partition; refusing to delete.")
                     return
 
                 # Extract numeric partition index from name (nvme0n1p7 -> 7)
-                m = re.search(r'(\d+)$', last["name"])
+                m = _TRAILING_DIGITS.search(last["name"])
                 pnum = m.group(1)
                 # pnum = "".join(ch for ch in last["name"] if ch.isdigit())
-                if not await self.run_command(f"sfdisk --delete {self.disk} {pnum}"):
+                if not await self.run_command(f"sfdisk --delete {shlex.quote(self.disk)} {pnum}"):
                     console.write("[ERROR] Failed deleting the last partition.")
                     return
 
@@ -1051,12 +1541,18 @@ class T2ArchInstaller(App):
                 existing_partition_names.discard(last["kname"])
 
                 if not await self.run_command(
-                    f"sfdisk --append {self.disk} <<'EOF'\n{script}EOF"
+                    f"sfdisk --append {shlex.quote(self.disk)}", input=script
                 ):
                     console.write("[ERROR] Appending partitions failed even after deleting the last empty ExFAT partition.")
                     return
 
-        parts_after = _parts()
+        # Wait once for udev to create the new partition nodes before listing and formatting them.
+        if not await self.run_command("udevadm settle --timeout=30"):
+            console.write("[WARN] udevadm settle did not finish; continuing anyway.")
+
+        parts_after = await _parts()
+        if parts_after is None:
+            return
 
         # Filter to only get newly created partitions (not in the original list)
         new_partitions = [p for p in parts_after if p["kname"] not in existing_partition_names]
@@ -1078,37 +1574,36 @@ class T2ArchInstaller(App):
         console.write(f"Creating filesystems with {self.filesystem_type}{' + LVM' if self.use_lvm else ''}...")
 
         # EFI
-        if not await self.run_command(f"mkfs.fat -F32 {efi_part}"):
+        if not await self.run_command(f"mkfs.fat -F32 {shlex.quote(efi_part)}"):
             console.write("[ERROR] mkfs.fat failed.")
             return
 
         # Swap (optional)
         if swap_part:
-            if not await self.run_command(f"mkswap {swap_part}"):
+            if not await self.run_command(f"mkswap {shlex.quote(swap_part)}"):
                 console.write("[ERROR] mkswap failed.")
                 return
 
         # Root & LVM
         if self.use_lvm:
-            if not await self.run_command(f"pvcreate {root_base}"): return
-            if not await self.run_command(f"vgcreate vg0 {root_base}"): return
+            if not await self.run_command(f"pvcreate {shlex.quote(root_base)}"): return
+            if not await self.run_command(f"vgcreate vg0 {shlex.quote(root_base)}"): return
             if not await self.run_command("lvcreate -l 100%FREE vg0 -n root"): return
             root_final = "/dev/vg0/root"
             if not await self.run_command(f"mkfs.{self.filesystem_type} /dev/vg0/root"): return
         else:
             if self.filesystem_type == "btrfs":
-                if not await self.run_command(f"mkfs.btrfs -f {root_base}"): return
+                if not await self.run_command(f"mkfs.btrfs -f {shlex.quote(root_base)}"): return
                 # Create subvolumes on a temporary mountpoint to avoid conflicts
                 # if /mnt is already in use from a previous attempt.
                 tmp_mount = tempfile.mkdtemp(prefix="t2arch_btrfs_")
                 mounted = False
                 try:
-                    if not await self.run_command(f"mount {root_base} {tmp_mount}"):
+                    if not await self.run_command(f"mount {shlex.quote(root_base)} {tmp_mount}"):
                         return
                     mounted = True
-                    for sv in ["@", "@home", "@snapshots", "@log", "@pkg"]:
-                        if not await self.run_command(f"btrfs subvolume create {tmp_mount}/{sv}"):
-                            return
+                    if not await self.run_command([f"btrfs subvolume create {tmp_mount}/{sv}" for sv in ["@", "@home", "@snapshots", "@log", "@pkg"]]):
+                        return
                 finally:
                     if mounted:
                         if not await self.run_command(f"umount {tmp_mount}"):
@@ -1118,30 +1613,28 @@ class T2ArchInstaller(App):
                     except OSError:
                         pass
             else:
-                if not await self.run_command(f"mkfs.{self.filesystem_type} {root_base}"): return
+                if not await self.run_command(f"mkfs.{self.filesystem_type} {shlex.quote(root_base)}"): return
             root_final = root_base
 
         console.write("Partitioning completed successfully!")
 
         # Auto-fill partition paths and switch to the mount tab
-        self.query_one("#root_input").value = root_final
-        self.query_one("#efi_input").value = efi_part
-        self.query_one("#swap_input").value = swap_part
-        self.query_one("#left_panel").focus()
-        self.query_one(TabbedContent).active = "mount_tab"
+        self._input("root_input").value = root_final
+        self._input("efi_input").value = efi_part
+        self._input("swap_input").value = swap_part
+        self.show_tab("mount_tab")
 
     async def mount_partitions(self):
         """Mount the specified partitions."""
-        console = self.query_one("#console", RichLog)
-        self.root_partition = self.query_one("#root_input").value.strip()
-        self.efi_partition = self.query_one("#efi_input").value.strip()
-        self.swap_partition = self.query_one("#swap_input").value.strip()
+        console = self._console
+        self.root_partition = self._input("root_input").value.strip()
+        self.efi_partition = self._input("efi_input").value.strip()
+        self.swap_partition = self._input("swap_input").value.strip()
         if not all([self.root_partition, self.efi_partition]):
             console.write("[ERROR] Please specify at least the Root and EFI partitions")
             return
         if re.fullmatch(r"/dev/[^/]+/[^/]+", self.root_partition):
-            await self.run_command("vgscan --mknodes >/dev/null 2>&1 || true")
-            await self.run_command("vgchange -ay >/dev/null 2>&1 || true")
+            await self.run_command(["vgscan --mknodes >/dev/null 2>&1 || true", "vgchange -ay >/dev/null 2>&1 || true"])
         self.root_partition = self.resolve_lvm_device_path(self.root_partition)
         root_fstype = self.probe_block_device_fstype(self.root_partition)
         if root_fstype:
@@ -1152,47 +1645,39 @@ class T2ArchInstaller(App):
         await self.run_command("umount -R /mnt 2>/dev/null || true")
         if self.filesystem_type == "btrfs":
             btrfs_opts = "rw,noatime,compress=zstd,space_cache=v2"
-            if not await self.run_command(f"mount -o {btrfs_opts},subvol=@ {self.root_partition} /mnt"):
+            if not await self.run_command(f"mount -o {btrfs_opts},subvol=@ {shlex.quote(self.root_partition)} /mnt"):
                 console.write("[ERROR] BTRFS root subvolume mount failed.")
                 return
-            if not await self.run_command("mkdir -p /mnt/home /mnt/.snapshots /mnt/var/log /mnt/var/cache/pacman/pkg"):
-                console.write("[ERROR] BTRFS directory creation failed.")
-                await self.run_command("umount /mnt")
-                return
-            subvol_mounts = [
-                (f"mount -o {btrfs_opts},subvol=@home {self.root_partition} /mnt/home", "/mnt/home"),
-                (f"mount -o {btrfs_opts},subvol=@snapshots {self.root_partition} /mnt/.snapshots", "/mnt/.snapshots"),
-                (f"mount -o {btrfs_opts},subvol=@log {self.root_partition} /mnt/var/log", "/mnt/var/log"),
-                (f"mount -o {btrfs_opts},subvol=@pkg {self.root_partition} /mnt/var/cache/pacman/pkg", "/mnt/var/cache/pacman/pkg"),
+            subvol_commands = [
+                "mkdir -p /mnt/home /mnt/.snapshots /mnt/var/log /mnt/var/cache/pacman/pkg",
+                f"mount -o {btrfs_opts},subvol=@home {shlex.quote(self.root_partition)} /mnt/home",
+                f"mount -o {btrfs_opts},subvol=@snapshots {shlex.quote(self.root_partition)} /mnt/.snapshots",
+                f"mount -o {btrfs_opts},subvol=@log {shlex.quote(self.root_partition)} /mnt/var/log",
+                f"mount -o {btrfs_opts},subvol=@pkg {shlex.quote(self.root_partition)} /mnt/var/cache/pacman/pkg",
             ]
-            mounted = ["/mnt"]
-            for cmd, mountpoint in subvol_mounts:
-                if not await self.run_command(cmd):
-                    console.write("[ERROR] BTRFS subvolume mount failed.")
-                    for mp in reversed(mounted):
-                        if not await self.run_command(f"umount {mp}"):
-                            await self.run_command(f"umount -l {mp}")
-                    return
-                mounted.append(mountpoint)
+            if not await self.run_command(subvol_commands):
+                console.write("[ERROR] BTRFS subvolume mount failed.")
+                # Undo whatever got mounted under /mnt, including /mnt itself.
+                await self.run_command("umount -R /mnt || umount -R -l /mnt")
+                return
         else:
-            if not await self.run_command(f"mount {self.root_partition} /mnt"):
+            if not await self.run_command(f"mount {shlex.quote(self.root_partition)} /mnt"):
                 console.write("[ERROR] Mounting failed.")
                 return
         commands = [
                     "mkdir -p /mnt/boot/efi",
-                    f"mount {self.efi_partition} /mnt/boot/efi",
+                    f"mount {shlex.quote(self.efi_partition)} /mnt/boot/efi",
                     ]
         if self.swap_partition and not self.is_swap_active(self.swap_partition):
-            commands.append(f"swapon {self.swap_partition}")
+            commands.append(f"swapon {shlex.quote(self.swap_partition)}")
         elif self.swap_partition:
             console.write(f"[INFO] Swap is already active on {self.swap_partition}; skipping swapon.")
-        for cmd in commands:
-            if not await self.run_command(cmd):
-                console.write("[ERROR] Mounting failed.")
-                return
+        if not await self.run_command(commands):
+            console.write("[ERROR] Mounting failed.")
+            return
         console.write("Partitions mounted successfully!")
         if self.disk:
-            await self.run_command(f"lsblk -p {self.disk}")
+            await self.show_disk_layout(self.disk)
         source, fstype = await self.refresh_target_root_storage(log_warnings=True)
         if fstype:
             console.write(
@@ -1200,52 +1685,46 @@ class T2ArchInstaller(App):
             )
         else:
             console.write("[WARN] Failed to detect the mounted target root filesystem.")
-        self.query_one("#left_panel").focus()
-        self.query_one(TabbedContent).active = "time_tab"
+        self.show_tab("time_tab")
 
     async def set_timezone(self):
         """Set the system timezone."""
-        console = self.query_one("#console", RichLog)
-        timezone = self.query_one("#timezone_input").value.strip() or "UTC"
+        console = self._console
+        timezone = self._input("timezone_input").value.strip() or "UTC"
         self.timezone = timezone
         if timezone == "UTC": console.write("No timezone specified, using UTC")
         await self.run_command("timedatectl set-ntp true")
-        await self.run_command(f"timedatectl set-timezone {timezone}")
+        await self.run_command(f"timedatectl set-timezone {shlex.quote(timezone)}")
         await self.run_command("hwclock --systohc")
         await self.run_command("timedatectl")
         console.write("Timezone configured successfully!")
-        self.query_one("#locales_input").focus()
+        self._input("locales_input").focus()
 
     def parse_locales(self, s: str) -> list[str]:
-        items = [x.strip() for x in re.split(r"[,\s]+", s or "") if x.strip()]
-        seen, out = set(), []
-        for it in items:
-            if it not in seen:
-                seen.add(it)
-                out.append(it)
-        return out
+        # dict.fromkeys drops duplicates while keeping the order they were typed in.
+        return list(dict.fromkeys(filter(None, _LOCALE_SPLIT.split(s or ""))))
 
     def update_available_locales_label(self):
         # Always show the default + any user-added locales (de-duped)
-        all_locales = ["en_US.UTF-8"] + [loc for loc in self.locales_added if loc != "en_US.UTF-8"]
-        self.query_one("#locales_available", Static).update(
-            "Available: " + ", ".join(all_locales)
+        self._locales_available.update(
+            "Available: " + ", ".join(self._all_locales)
         )
 
     def add_locales(self):
         """Add locales to the system."""
-        console = self.query_one("#console", RichLog)
-        rawlocales = self.query_one("#locales_input", Input).value
+        console = self._console
+        rawlocales = self._input("locales_input").value
         self.locales_added = self.parse_locales(rawlocales)
+        # The default locale is always generated; keep it first and only once.
+        self._all_locales = ["en_US.UTF-8", *(loc for loc in self.locales_added if loc != "en_US.UTF-8")]
         self.update_available_locales_label()
-        all_locales = ["en_US.UTF-8"] + [loc for loc in self.locales_added if loc != "en_US.UTF-8"]
-        console.write("Added locales:"+", ".join(all_locales))
-        self.query_one("#lang_input").focus()
+        console.write("Added locales:"+", ".join(self._all_locales))
+        self._input("lang_input").focus()
 
     async def set_language(self):
         """Set the system language."""
-        console = self.query_one("#console", RichLog)
-        self.lang_selected = (self.query_one("#lang_input", Input).value or "en_US.UTF-8").strip()
+        console = self._console
+        self.lang_selected = (self._input("lang_input").value or "en_US.UTF-8").strip()
         try:
             target_etc = os.path.join(self._get_target_root(), "etc")
             os.makedirs(target_etc, exist_ok=True)
@@ -1254,8 +1733,7 @@ class T2ArchInstaller(App):
         except Exception as e:
             console.write(f"Could not create vconsole.conf: {e}")
         console.write("Language configured successfully!")
-        self.query_one("#left_panel").focus()
-        self.query_one(TabbedContent).active = "packages_tab"
+        self.show_tab("packages_tab")
 
     def check_repo_in_pacman_conf(self, repo_name: str = "arch-mact2", chroot: bool = False) -> tuple[bool, Optional[str]]:
         """
@@ -1300,7 +1778,7 @@ class T2ArchInstaller(App):
             return (False, None)
         except Exception as e:
             try:
-                console = self.query_one("#console", RichLog)
+                console = self._console
                 conf_path = "/mnt/etc/pacman.conf" if chroot else "/etc/pacman.conf"
                 console.write(f"Error reading {conf_path}: {e}")
             except Exception:
@@ -1368,7 +1846,7 @@ class T2ArchInstaller(App):
         except Exception as e:
             # Log the error to the console before returning False
             try:
-                console = self.query_one("#console", RichLog)
+                console = self._console
                 console.write(f"[ERROR] Failed to update repository URL: {e}")
             except Exception:
                 # Fallback to printing if console is not available
@@ -1387,12 +1865,37 @@ class T2ArchInstaller(App):
         Returns:
             str: Formatted repository configuration string
         """
-        return f"[{repo_name}]\\nServer = {server_url}\\nSigLevel = {sig_level}"
+        return f"[{repo_name}]\nServer = {server_url}\nSigLevel = {sig_level}\n"
 
-    def write_t2_repo_config(self, target_root: str) -> bool:
-        """Ensure pacman.conf uses the Include-based arch-mact2 repo definition."""
-        console = self.query_one("#console", RichLog)
-        conf_path = os.path.join(target_root, "etc/pacman.conf")
+    def append_repo_to_pacman_conf(self, repo_name: str, server_url: str, chroot: bool = False, sig_level: str = "Never") -> bool:
+        """
+        Append a repository section to the end of /etc/pacman.conf.
+
+        Arguments:
+            repo_name: Name of the repository
+            server_url: Server URL for the repository
+            chroot: If True, append to /mnt/etc/pacman.conf instead
+            sig_level: Signature verification level
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        conf_path = "/mnt/etc/pacman.conf" if chroot else "/etc/pacman.conf"
+        try:
+            with open(conf_path, "r+", encoding="utf-8", newline="\n") as f:
+                content = f.read()
+                # Keep a blank line between the previous section and the new one.
+                separator = "" if not content else "\n" if content.endswith("\n") else "\n\n"
+                f.write(separator + self.build_repo_config(repo_name, server_url, sig_level))
+            return True
+        except Exception as e:
+            self._console.write(f"[ERROR] Failed to add the {repo_name} repository to {conf_path}: {e}")
+            return False
+
+    def write_t2_repo_config(self, target_root: str) -> bool:
+        """Ensure pacman.conf uses the Include-based arch-mact2 repo definition."""
+        console = self._console
+        conf_path = os.path.join(target_root, "etc/pacman.conf")
         repo_config = "\n".join([
             "[arch-mact2]",
             "SigLevel = Never",
@@ -1440,9 +1943,53 @@ class T2ArchInstaller(App):
             console.write(f"[ERROR] Failed to configure the T2 repository in pacman.conf: {e}")
             return False
 
+    def ensure_parallel_downloads(self, target_root: str, count: int = PARALLEL_DOWNLOADS) -> bool:
+        """Make pacman download at least `count` packages at a time in the given root's pacman.conf."""
+        console = self._console
+        conf_path = os.path.join(target_root, "etc/pacman.conf")
+        try:
+            with open(conf_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+
+            options_index = None
+            setting_index = None
+            for i, line in enumerate(lines):
+                stripped = line.strip()
+                if stripped == "[options]":
+                    options_index = i
+                    continue
+                if options_index is None:
+                    continue
+                if stripped.startswith("[") and stripped.endswith("]"):
+                    break
+                match = _PARALLEL_DOWNLOADS_LINE.match(stripped)
+                if match:
+                    # An active setting that is already high enough is left alone.
+                    if not match.group(1) and int(match.group(2) or 0) >= count:
+                        return True
+                    if setting_index is None or not match.group(1):
+                        setting_index = i
+
+            if options_index is None:
+                console.write(f"[WARN] No [options] section in {conf_path}; leaving ParallelDownloads unchanged.")
+                return False
+
+            setting = f"ParallelDownloads = {count}\n"
+            if setting_index is not None:
+                lines[setting_index] = setting
+            else:
+                lines.insert(options_index + 1, setting)
+
+            with open(conf_path, "w", encoding="utf-8", newline="\n") as f:
+                f.writelines(lines)
+            return True
+        except Exception as e:
+            console.write(f"[WARN] Failed to enable parallel downloads in {conf_path}: {e}")
+            return False
+
     async def configure_t2_repository(self, use_chroot: bool = False) -> bool:
         """Configure the T2 repository using the mirrorlist and rankmirrors flow."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         target_root = self._get_target_root() if use_chroot else "/"
         runner = self.run_in_chroot if use_chroot else self.run_command
         package_mirrorlist_full_path = os.path.join(target_root, os.path.relpath("/etc/pacman.d/arch-mact2-mirrorlist", "/"))
@@ -1465,6 +2012,9 @@ class T2ArchInstaller(App):
             if not self.write_t2_repo_config(target_root):
                 return False
 
+        # Not fatal: pacman still works with its default download concurrency.
+        self.ensure_parallel_downloads(target_root)
+
         # In post-install mode run_in_chroot targets the current system, so report the actual filesystem being changed.
         location = "the target system" if use_chroot and target_root == "/mnt" else "the current system"
         console.write(f"Configuring the T2 repository mirrorlist on {location}...")
@@ -1490,46 +2040,63 @@ class T2ArchInstaller(App):
     async def add_t2_repository(self):
         """Add the T2 repository to pacman."""
         if await self.configure_t2_repository():
-            self.query_one("#pacstrap_auto_btn").focus()
+            self._widget("pacstrap_auto_btn").focus()
 
     async def add_t2_repo_to_chroot(self) -> bool:
-        """Add the T2 repository to pacman inside the target system."""
-        if await self.configure_t2_repository(use_chroot=True):
-            self.query_one("#config_basic_btn").focus()
-            return True
-        return False
+        """Add the T2 repository to pacman inside the target system, skipping a recent successful sync."""
+        target_root = self._get_target_root()
+        synced_at = self._t2_repo_synced.get(target_root)
+        # A new pacstrap brings an empty sync directory, which needs the full refresh again.
+        synced_files = ("etc/pacman.d/arch-mact2-mirrorlist", "var/lib/pacman/sync/arch-mact2.db")
+        recent = synced_at is not None and time.monotonic() - synced_at < T2_REPO_SYNC_TTL
+        if recent and all(os.path.exists(os.path.join(target_root, path)) for path in synced_files):
+            # pacman.conf may have been replaced since (e.g. by a new pacstrap), so the cheap,
+            # idempotent repo entry is always rewritten; only the network steps are skipped.
+            if not self.write_t2_repo_config(target_root):
+                return False
+            self._console.write("T2 repository mirrors were synced recently, skipping the refresh.")
+        elif await self.configure_t2_repository(use_chroot=True):
+            self._t2_repo_synced[target_root] = time.monotonic()
+        else:
+            return False
+        self._widget("config_basic_btn").focus()
+        return True
 
     async def install_base_system_auto(self):
         """Install the base system with T2 packages automatically using pacstrap."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         if self.post_install_mode:
             console.write("[WARN] pacstrap is install-only and will be skipped in post-install mode.")
             return
         packages = "base linux-t2 linux-t2-headers apple-t2-audio-config apple-bcm-firmware linux-firmware iwd networkmanager bluez bluez-utils bluez-tools t2fanrd grub efibootmgr nano sudo git base-devel lvm2 btrfs-progs"
         cmd = f"pacstrap -K /mnt {packages}"
+        # pacstrap downloads with the host's pacman.conf, which may not have been touched yet if the
+        # T2 repository step was skipped. Not fatal, like in configure_t2_repository.
+        self.ensure_parallel_downloads("/")
         console.write("Installing base system... This might take a while (10+ minutes)...")
         if await self.run_command(cmd, timeout=1800):
+            # A fresh pacstrap may have brought a fresh pacman.conf.
+            self._pacman_prepared.discard("/mnt")
             console.write("Base system installed successfully!")
-            self.query_one("#left_panel").focus()
-            self.query_one(TabbedContent).active = "system_tab"
+            self.show_tab("system_tab")
         else:
             console.write("[ERROR] Base system installation failed. Try using the manual install.")
 
     def install_base_system_manual(self):
         """Install the base system with T2 packages manually by exiting the app and showing the pacstrap command."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         if self.post_install_mode:
             console.write("[WARN] Manual pacstrap is install-only and unavailable in post-install mode.")
             return
         console.write("Exiting the app for manual installation...")
         console.write("Run this command in your terminal:")
-        console.write(self.query_one("#pacstrap_cmd").render())
+        console.write(self._widget("pacstrap_cmd", Static).render())
         console.write("And once you're finished, restart the app to continue.")
         self.exit()
 
     async def generate_fstab(self):
         """Generate /etc/fstab and configure Snapper for BTRFS."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         if self.post_install_mode:
             console.write("[WARN] genfstab is install-only and will be skipped in post-install mode.")
             return
@@ -1540,9 +2107,9 @@ class T2ArchInstaller(App):
         # Configure Snapper only when Btrfs is actually used for the root filesystem.
         if await self.target_root_uses_btrfs():
             # Install snapper packages in chroot
-            snapper_pkgs = "snapper btrfs-assistant"
-            console.write(f"Installing snapper packages: {snapper_pkgs}...")
-            if not await self.run_in_chroot(f"pacman -S --noconfirm --needed {snapper_pkgs}"):
+            snapper_pkgs = ("snapper", "btrfs-assistant")
+            console.write(f"Installing snapper packages: {' '.join(snapper_pkgs)}...")
+            if not await self.install_packages(snapper_pkgs):
                 console.write("[ERROR] Failed to install snapper packages.")
                 return
             # Check if snapper root config already exists to make this idempotent.
@@ -1562,7 +2129,7 @@ class T2ArchInstaller(App):
                 await self.run_command(f"btrfs subvolume delete {snapshots_mount}")
                 await self.run_command(f"mkdir -p {snapshots_mount}")
                 btrfs_opts = "rw,noatime,compress=zstd,space_cache=v2"
-                await self.run_command(f"mount -o {btrfs_opts},subvol=@snapshots {self.root_partition} {snapshots_mount}")
+                await self.run_command(f"mount -o {btrfs_opts},subvol=@snapshots {shlex.quote(self.root_partition)} {snapshots_mount}")
             # Set cleanup limits
             limit_overrides = {
                 "TIMELINE_LIMIT_HOURLY": '"5"',
@@ -1591,102 +2158,155 @@ class T2ArchInstaller(App):
                 console.write("Snapper cleanup limits configured.")
             except Exception as e:
                 console.write(f"[WARN] Could not set snapper cleanup limits: {e}")
-            enable_cmds = [
-                "systemctl enable snapper-timeline.timer",
-                "systemctl enable snapper-cleanup.timer",
-                "systemctl enable snapper-boot.timer",
-            ]
-            for cmd in enable_cmds:
-                if not await self.run_in_chroot(cmd):
-                    console.write(f"[WARN] Failed to enable: {cmd}")
+            timers = ("snapper-timeline.timer", "snapper-cleanup.timer", "snapper-boot.timer")
+            if not await self.run_in_chroot(f"systemctl enable {' '.join(timers)}"):
+                # systemctl gives up at the first missing unit, so enable the rest one by one and name what failed.
+                for timer in timers:
+                    if not await self.run_in_chroot(f"systemctl enable {timer}"):
+                        console.write(f"[WARN] Failed to enable: {timer}")
             console.write("Snapper BTRFS Snapshots configured and fstab generated successfully!")
         else:
             console.write("[INFO] Skipping Snapper configuration because the root filesystem is not Btrfs.")
-        self.query_one("#chroot_repo_btn").focus()
+        self._widget("chroot_repo_btn").focus()
 
 
     async def configure_basic_system(self):
         """Configure T2 modules, locale, and time."""
         commands = [
-                    f"ln -sf /usr/share/zoneinfo/{self.timezone} /etc/localtime",
+                    f"ln -sf /usr/share/zoneinfo/{shlex.quote(self.timezone)} /etc/localtime",
                     "hwclock --systohc"
                     ]
 
-        locales_to_enable = ["en_US.UTF-8"] + [loc for loc in self.locales_added if loc != "en_US.UTF-8"]
         lang = self.lang_selected or "en_US.UTF-8"
-        for loc in locales_to_enable:
-            commands.append(f"echo '{loc} UTF-8' >> /etc/locale.gen")
+        locale_args = " ".join(shlex.quote(loc) for loc in self._all_locales)
         commands += [
+            f"printf '%s UTF-8\\n' {locale_args} >> /etc/locale.gen",
             "locale-gen",
-            f"echo 'LANG={lang}' > /etc/locale.conf",
-            f"echo 'LANGUAGE={lang}' >> /etc/locale.conf",
         ]
 
-        for cmd in commands:
-            if not await self.run_in_chroot(cmd):
-                self.query_one("#console", RichLog).write("[ERROR] Basic configuration failed")
-                return
-        self.query_one("#console", RichLog).write("Basic system configuration completed!")
-        self.query_one("#hostname_input").focus()
+        if not await self.run_in_chroot(commands):
+            self._console.write("[ERROR] Basic configuration failed")
+            return
+        if not self.write_target_file("/etc/locale.conf", f"LANG={lang}\nLANGUAGE={lang}\n"):
+            self._console.write("[ERROR] Basic configuration failed")
+            return
+        self._console.write("Basic system configuration completed!")
+        self._input("hostname_input").focus()
 
     async def set_hostname(self):
         """Set the system hostname."""
-        console = self.query_one("#console", RichLog)
-        hostname = self.query_one("#hostname_input").value.strip()
+        console = self._console
+        hostname = self._input("hostname_input").value.strip()
         if not hostname:
             console.write("[ERROR] Please enter a hostname")
             return
-        cmd = f"echo {hostname} > /etc/hostname"
-        if await self.run_in_chroot(cmd):
+        if self.write_target_file("/etc/hostname", f"{hostname}\n"):
             console.write("Hostname set successfully!")
-            self.query_one("#root_password_input").focus()
+            self._input("root_password_input").focus()
         else:
             console.write("[ERROR] Hostname setting failed")
 
     async def set_root_password(self):
         """Set the root password."""
-        console = self.query_one("#console", RichLog)
-        root_password = self.query_one("#root_password_input").value.strip()
+        console = self._console
+        root_password = self._input("root_password_input").value.strip()
         if not root_password:
             console.write("[ERROR] Please enter a root password")
             return
-        cmd = f"echo 'root:{root_password}' | chpasswd"
-        if await self.run_in_chroot(cmd):
+        # The password goes in on stdin so it never appears in a command line or the log.
+        if await self.run_in_chroot("chpasswd", input=f"root:{root_password}\n", display="chpasswd  # root password hidden"):
             console.write("Root password set successfully!")
-            self.query_one("#root_password_input").value = ""
-            self.query_one("#config_sudo_btn").focus()
+            self._input("root_password_input").value = ""
+            self._widget("config_sudo_btn").focus()
         else:
-            self.query_one("#console", RichLog).write("[ERROR] Root password setting failed")
+            self._console.write("[ERROR] Root password setting failed")
 
     async def configure_sudoers(self):
-        """Configure the sudoers file by uncommenting wheel."""
-        console = self.query_one("#console", RichLog)
-        cmd = "sed -i 's/^# \\(%wheel ALL=(ALL:ALL) ALL\\)/\\1/' /etc/sudoers"
-        if await self.run_in_chroot(cmd):
+        """Allow the wheel group to use sudo through a drop-in file."""
+        console = self._console
+        # A drop-in survives sudoers.pacnew updates and doesn't depend on the stock comment text.
+        if self.write_target_file("/etc/sudoers.d/wheel", "%wheel ALL=(ALL:ALL) ALL\n", mode=0o440):
             console.write("Sudoers configured successfully!")
-            self.query_one("#build_initramfs_btn").focus()
+            self._widget("build_initramfs_btn").focus()
         else:
             console.write("[ERROR] Sudoers configuration failed")
 
+    def update_mkinitcpio_hooks(self, plymouth: bool = False, lvm: bool = False) -> bool:
+        """
+        Add the plymouth hook (before block) and/or the lvm2 hook (after block) to the
+        target's mkinitcpio.conf, keeping every other hook the user already has.
+        """
+        console = self._console
+        conf_path = os.path.join(self._get_target_root(), "etc/mkinitcpio.conf")
+        try:
+            with open(conf_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+
+            for i, line in enumerate(lines):
+                match = _MKINITCPIO_HOOKS.match(line)
+                if not match:
+                    continue
+                hooks = match.group(1).split()
+                if "block" not in hooks:
+                    console.write(f"[ERROR] No block hook in {conf_path}; not changing HOOKS.")
+                    return False
+                if plymouth and "plymouth" not in hooks:
+                    hooks.insert(hooks.index("block"), "plymouth")
+                if lvm and "lvm2" not in hooks:
+                    hooks.insert(hooks.index("block") + 1, "lvm2")
+                new_line = f"HOOKS=({' '.join(hooks)})\n"
+                if new_line != line:
+                    lines[i] = new_line
+                    with open(conf_path, "w", encoding="utf-8", newline="\n") as f:
+                        f.writelines(lines)
+                return True
+
+            console.write(f"[ERROR] No HOOKS line found in {conf_path}.")
+            return False
+        except OSError as e:
+            console.write(f"[ERROR] Failed to update mkinitcpio hooks: {e}")
+            return False
+
+    def mkinitcpio_has_hook(self, hook: str) -> bool:
+        """Return whether the active HOOKS line in the target's mkinitcpio.conf includes hook."""
+        conf_path = os.path.join(self._get_target_root(), "etc/mkinitcpio.conf")
+        try:
+            with open(conf_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    match = _MKINITCPIO_HOOKS.match(line)
+                    if match:
+                        return hook in match.group(1).split()
+        except OSError:
+            pass
+        return False
+
     async def build_initramfs(self):
         """Build the initial ramdisk."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
+        # Plymouth chosen up front goes into this build, so install_plymouth doesn't need a second one.
+        if self.use_plymouth:
+            if not await self.prepare_plymouth():
+                return
         # Add lvm2 hook if using LVM
-        if self.use_lvm:
-            await self.run_in_chroot("sed -i 's|HOOKS=(base udev autodetect microcode modconf kms keyboard keymap consolefont block filesystems fsck)|HOOKS=(base udev autodetect microcode modconf kms keyboard keymap consolefont block lvm2 filesystems fsck)|' /etc/mkinitcpio.conf")
+        elif self.use_lvm and not self.update_mkinitcpio_hooks(lvm=True):
+            return
         console.write("Building initramfs (This might take a while)...")
+        # Fetch the boot icon in the background while mkinitcpio keeps the CPU busy.
+        if self._icon_prefetch is None:
+            self._icon_prefetch = asyncio.create_task(self.prefetch_boot_icon())
         if await self.run_in_chroot("mkinitcpio -P", timeout=600):
+            # The hook may have been added earlier from the Boot tab, so read what was actually built.
+            self.plymouth_in_initramfs = self.mkinitcpio_has_hook("plymouth")
             console.write("Initramfs built successfully!")
-            self.query_one("#left_panel").focus()
-            self.query_one(TabbedContent).active = "boot_tab"
+            self.show_tab("boot_tab")
         else:
             console.write("[ERROR] Initramfs build failed")
 
     async def install_grub(self):
         """Install and configure GRUB as the bootloader."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         grub_params = "quiet splash intel_iommu=on iommu=pt pcie_ports=auto pm_async=off acpi_osi=!Darwin acpi_osi=Linux"
-        if not await self.run_in_chroot(f"sed -i 's|GRUB_CMDLINE_LINUX=\".*\"|GRUB_CMDLINE_LINUX=\"{grub_params}\"|' /etc/default/grub"):
+        if not self.rewrite_target_file("/etc/default/grub", [(r'GRUB_CMDLINE_LINUX=".*"', f'GRUB_CMDLINE_LINUX="{grub_params}"')]):
             console.write("[ERROR] GRUB installation failed")
             return
         if not await self.run_in_chroot("grub-install --target=x86_64-efi --efi-directory=/boot/efi --bootloader-id=GRUB --removable"):
@@ -1710,7 +2330,7 @@ class T2ArchInstaller(App):
             console.write(f"[WARN] Failed to silence GRUB loading messages: {e}")
         if await self.target_root_uses_btrfs():
             console.write("Installing grub-btrfs for snapshot boot entries...")
-            if not await self.run_in_chroot("pacman -S --noconfirm --needed grub-btrfs inotify-tools"):
+            if not await self.install_packages(("grub-btrfs", "inotify-tools")):
                 console.write("[WARN] Failed to install grub-btrfs, skipping.")
             else:
                 if not await self.run_in_chroot("systemctl enable grub-btrfsd.service"):
@@ -1719,15 +2339,15 @@ class T2ArchInstaller(App):
             console.write("[ERROR] GRUB installation failed")
             return
         console.write("GRUB installed successfully!")
-        self.query_one("#boot_icon_btn").focus()
+        self._widget("boot_icon_btn").focus()
 
     async def install_systemd_boot(self):
         """Install and configure systemd-boot as the bootloader."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         console.write("Installing systemd-boot...")
 
-        # Install to the ESP mounted at /boot/efi
-        if not await self.run_in_chroot("bootctl --esp-path=/boot/efi install"):
+        # Install to the ESP mounted at /boot/efi and copy the kernel next to it in one chroot.
+        if not await self.run_in_chroot(["bootctl --esp-path=/boot/efi install", *ESP_KERNEL_COPY_COMMANDS]):
             console.write("[ERROR] systemd-boot installation failed")
             return
 
@@ -1736,28 +2356,27 @@ class T2ArchInstaller(App):
             kernel_params += " rootflags=subvol=@"
         root_part = "root=/dev/vg0/root" if self.use_lvm else f"root={self.root_partition}"
 
-        commands = [
-            "install -d /boot/efi/loader/entries",
-            "install -Dm0644 /boot/vmlinuz-linux-t2 /boot/efi/vmlinuz-linux-t2",
-            "install -Dm0644 /boot/initramfs-linux-t2.img /boot/efi/initramfs-linux-t2.img",
-            "[ -f /boot/initramfs-linux-t2-fallback.img ] && install -Dm0644 /boot/initramfs-linux-t2-fallback.img /boot/efi/initramfs-linux-t2-fallback.img || true",
-            "printf '%s\\n' 'default arch.conf' 'timeout 3' > /boot/efi/loader/loader.conf",
-            f"printf '%s\\n' 'title   Arch Linux T2' 'linux   /vmlinuz-linux-t2' 'initrd  /initramfs-linux-t2.img' 'options {root_part} {kernel_params}' > /boot/efi/loader/entries/arch.conf",
-        ]
-        for cmd in commands:
-            if not await self.run_in_chroot(cmd):
-                console.write("[ERROR] Failed to finalize systemd-boot configuration")
-                return
+        loader_conf = "default arch.conf\ntimeout 3\n"
+        arch_conf = (
+            "title   Arch Linux T2\n"
+            "linux   /vmlinuz-linux-t2\n"
+            "initrd  /initramfs-linux-t2.img\n"
+            f"options {root_part} {kernel_params}\n"
+        )
+        if not (self.write_target_file("/boot/efi/loader/loader.conf", loader_conf)
+                and self.write_target_file("/boot/efi/loader/entries/arch.conf", arch_conf)):
+            console.write("[ERROR] Failed to finalize systemd-boot configuration")
+            return
 
         console.write("systemd-boot installed successfully!")
-        self.query_one("#boot_icon_btn").focus()
+        self._widget("boot_icon_btn").focus()
 
     async def install_limine(self):
         """Install and configure Limine as the bootloader."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         console.write("Installing Limine...")
 
-        if not await self.run_in_chroot("pacman -S --noconfirm --needed limine"):
+        if not await self.install_packages(("limine",)):
             console.write("[ERROR] Limine installation failed")
             return
 
@@ -1771,14 +2390,11 @@ class T2ArchInstaller(App):
             "install -d /boot/efi/EFI/BOOT",
             "install -Dm0644 /usr/share/limine/BOOTX64.EFI /boot/efi/EFI/BOOT/BOOTX64.EFI",
             # Copy kernel and initramfs to the ESP so boot(): can access them
-            "install -Dm0644 /boot/vmlinuz-linux-t2 /boot/efi/vmlinuz-linux-t2",
-            "install -Dm0644 /boot/initramfs-linux-t2.img /boot/efi/initramfs-linux-t2.img",
-            "[ -f /boot/initramfs-linux-t2-fallback.img ] && install -Dm0644 /boot/initramfs-linux-t2-fallback.img /boot/efi/initramfs-linux-t2-fallback.img || true",
+            *ESP_KERNEL_COPY_COMMANDS,
         ]
-        for cmd in commands:
-            if not await self.run_in_chroot(cmd):
-                console.write("[ERROR] Failed to finalize Limine configuration")
-                return
+        if not await self.run_in_chroot(commands):
+            console.write("[ERROR] Failed to finalize Limine configuration")
+            return
         limine_conf_path = os.path.join(self._get_target_root(), "boot", "efi", "limine.conf")
         limine_conf_lines = [
             "timeout: 3",
@@ -1838,30 +2454,74 @@ class T2ArchInstaller(App):
                 console.write("[WARN] Limine snapshot integration helpers are unavailable in the current package set; skipping automatic snapshot integration.")
 
         console.write("Limine installed successfully!")
-        self.query_one("#boot_icon_btn").focus()
+        self._widget("boot_icon_btn").focus()
+
+    async def prefetch_boot_icon(self) -> bool:
+        """
+        Copy the boot icon SVG into the target system without logging, for create_boot_icon to reuse.
+        It is downloaded only if the host cache does not have it yet.
+        """
+        dest = os.path.join(self._get_target_root(), BOOT_ICON_SVG.lstrip("/"))
+
+        def copy_icon() -> bool:
+            if not _is_svg_file(BOOT_ICON_CACHE):
+                _download_file(BOOT_ICON_URL, BOOT_ICON_CACHE)
+                if not _is_svg_file(BOOT_ICON_CACHE):
+                    os.remove(BOOT_ICON_CACHE)
+                    return False
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copyfile(BOOT_ICON_CACHE, dest)
+            return True
+
+        try:
+            return await asyncio.to_thread(copy_icon)
+        except Exception:
+            # create_boot_icon downloads it itself if this did not work.
+            return False
 
     async def create_boot_icon(self):
         """Create an icon for the macOS startup manager."""
-        console = self.query_one("#console", RichLog)
-        if not await self.run_in_chroot("pacman -S --noconfirm --needed wget librsvg libicns", timeout=600):
+        console = self._console
+        # The icon is generated from a fixed SVG, so an existing one is already what we would produce.
+        if os.path.isfile(os.path.join(self._get_target_root(), "boot/efi/.VolumeIcon.icns")):
+            console.write("Boot icon already exists, skipping.")
+            self._widget("boot_label_btn").focus()
+            return
+        # The label's packages come along, so the label step finds them in the database and skips pacman.
+        if not await self.install_packages(BOOT_ICON_PACKAGES + BOOT_LABEL_PACKAGES):
             console.write("[ERROR] Failed to install boot icon packages")
             return
-        icon_url = "https://archlinux.org/logos/archlinux-icon-crystal-64.svg"
+        if self._icon_prefetch is not None:
+            await self._icon_prefetch
+            # The task copied into whatever root was current when it started; don't reuse it for another.
+            self._icon_prefetch = None
+        target_svg = os.path.join(self._get_target_root(), BOOT_ICON_SVG.lstrip("/"))
+        fetch_icon = ""
+        if not _is_svg_file(target_svg) and not await self.prefetch_boot_icon():
+            # Last resort: let the target fetch it (curl is always there, pacman depends on it).
+            fetch_icon = f"curl -fsSL -o {BOOT_ICON_SVG} {BOOT_ICON_URL} && "
         icon_commands = (
-            f"wget -q -O /tmp/arch.svg {icon_url} && "
-            "rsvg-convert -w 128 -h 128 -o /tmp/arch.png /tmp/arch.svg && "
-            "png2icns /boot/efi/.VolumeIcon.icns /tmp/arch.png"
+            fetch_icon +
+            f"rsvg-convert -w 128 -h 128 -o /tmp/arch.png {BOOT_ICON_SVG} && "
+            "png2icns /boot/efi/.VolumeIcon.icns /tmp/arch.png && "
+            f"rm -f {BOOT_ICON_SVG} /tmp/arch.png"
         )
         if await self.run_in_chroot(icon_commands, timeout=600):
             console.write("Boot icon created successfully!")
-            self.query_one("#boot_label_btn").focus()
+            self._widget("boot_label_btn").focus()
         else:
+            # Don't let a bad SVG break every later attempt; the next one downloads it again.
+            for path in (BOOT_ICON_CACHE, target_svg):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
             console.write("[ERROR] Boot icon creation failed")
 
     async def create_boot_label(self):
         """Create a label for the macOS startup manager."""
-        console = self.query_one("#console", RichLog)
-        if not await self.run_in_chroot("pacman -S --noconfirm --needed python-pillow tex-gyre-fonts", timeout=600):
+        console = self._console
+        if not await self.install_packages(BOOT_ICON_PACKAGES + BOOT_LABEL_PACKAGES):
             console.write("[ERROR] Failed to install boot label packages")
             return
         label_commands = [
@@ -1869,76 +2529,62 @@ class T2ArchInstaller(App):
           "chmod +x disklabel-maker.py",
           "python3 disklabel-maker.py 'Arch' /usr/share/fonts/tex-gyre/texgyreheros-regular.otf /boot/efi/EFI/BOOT"
         ]
-        for cmd in label_commands:
-            if not await self.run_in_chroot(cmd):
-                console.write("[ERROR] Boot label creation failed")
-                return
+        if not await self.run_in_chroot(label_commands):
+            console.write("[ERROR] Boot label creation failed")
+            return
         console.write("Boot label created successfully!")
-        self.query_one("#plymouth_btn").focus()
+        self._widget("plymouth_btn").focus()
 
-    async def install_plymouth(self):
-        """Install Plymouth for boot animation."""
-        console = self.query_one("#console", RichLog)
-        if not await self.run_in_chroot("pacman -S --noconfirm --needed plymouth librsvg", timeout=600):
+    async def prepare_plymouth(self) -> bool:
+        """Install Plymouth, add its mkinitcpio hook and theme; the initramfs still has to be rebuilt."""
+        console = self._console
+        if not await self.install_packages(("plymouth", "librsvg")):
             console.write("[ERROR] Failed to install plymouth")
-            return
-        # Add plymouth to HOOKS before the block hook on lines that don't already include it
-        hook_cmd = r"sed -i '/^HOOKS=/ {/plymouth/! s/\bblock\b/plymouth block/ }' /etc/mkinitcpio.conf"
-        if not await self.run_in_chroot(hook_cmd):
+            return False
+        # Add plymouth before the block hook, and make sure lvm2 follows block when LVM is in use
+        if not self.update_mkinitcpio_hooks(plymouth=True, lvm=self.use_lvm):
             console.write("[ERROR] Failed to update mkinitcpio hooks for plymouth")
-            return
-        # Ensure the lvm2 hook is present when LVM is in use
-        if self.use_lvm:
-            lvm_cmd = r"sed -i '/^HOOKS=/ {/lvm2/! s/\bblock\b/block lvm2/ }' /etc/mkinitcpio.conf"
-            if not await self.run_in_chroot(lvm_cmd):
-                console.write("[ERROR] Failed to add lvm2 hook after Plymouth setup")
-                return
-        # Validate the hooks for both modes
-        if not await self.run_in_chroot(r"grep -Eq '^HOOKS=.*plymouth.*block' /etc/mkinitcpio.conf"):
-            console.write("[ERROR] Failed to add Plymouth to mkinitcpio hooks")
-            return
-        if self.use_lvm and not await self.run_in_chroot(r"grep -Eq '^HOOKS=.*plymouth.*block.*lvm2' /etc/mkinitcpio.conf"):
-            console.write("[ERROR] lvm2 hook missing after Plymouth setup")
-            return
+            return False
         console.write("Setting up Apple logo BGRT fallback...")
-        apple_logo_svg = '<svg role="img" viewBox="0 0 290 290" xmlns="http://www.w3.org/2000/svg"><path fill="#ffffff" transform="translate(90 190) scale(4)" d="M12.152 6.896c-.948 0-2.415-1.078-3.96-1.04-2.04.027-3.91 1.183-4.961 3.014-2.117 3.675-.546 9.103 1.519 12.09 1.013 1.454 2.208 3.09 3.792 3.039 1.52-.065 2.09-.987 3.935-.987 1.831 0 2.35.987 3.96.948 1.637-.026 2.676-1.48 3.676-2.948 1.156-1.688 1.636-3.325 1.662-3.415-.039-.013-3.182-1.221-3.22-4.857-.026-3.04 2.48-4.494 2.597-4.559-1.429-2.09-3.623-2.324-4.39-2.376-2-.156-3.675 1.09-4.61 1.09zM15.53 3.83c.843-1.012 1.4-2.427 1.245-3.83-1.207.052-2.662.805-3.532 1.818-.78.896-1.454 2.338-1.273 3.714 1.338.104 2.715-.688 3.559-1.701"/></svg>'
         fallback_cmd = (
             "install -d /usr/share/plymouth/themes/spinner && "
-            f"printf '%s' {shlex.quote(apple_logo_svg)} > /tmp/apple-logo.svg && "
+            f"printf '%s' {shlex.quote(APPLE_LOGO_SVG)} > /tmp/apple-logo.svg && "
             "rsvg-convert -w 290 -h 290 -b none -o /tmp/bgrt-fallback.png /tmp/apple-logo.svg && "
             "install -Dm644 /tmp/bgrt-fallback.png /usr/share/plymouth/themes/spinner/bgrt-fallback.png && "
             "plymouth-set-default-theme bgrt"
         )
         if not await self.run_in_chroot(fallback_cmd, timeout=600):
             console.write("[WARN] Failed to set Plymouth BGRT fallback logo")
+        return True
+
+    async def install_plymouth(self):
+        """Install Plymouth for boot animation."""
+        console = self._console
+        if self.plymouth_in_initramfs:
+            console.write("Plymouth was already included when the initramfs was built, skipping.")
+            self.show_tab("desktop_tab")
+            return
+        if not await self.prepare_plymouth():
+            return
         console.write("Rebuilding initramfs to add Plymouth (This might take a while)...")
         if await self.run_in_chroot("mkinitcpio -P", timeout=600):
+            self.plymouth_in_initramfs = self.mkinitcpio_has_hook("plymouth")
             console.write("Plymouth installed and initramfs rebuilt successfully!")
-            # Refresh systemd-boot's copy of the kernel/initramfs so the Plymouth hook is included at boot.
-            if self.bootloader_type == "systemd-boot":
-                console.write("Updating kernel/initramfs on ESP for systemd-boot...")
-                if not await self.run_in_chroot("install -Dm0644 /boot/vmlinuz-linux-t2 /boot/efi/vmlinuz-linux-t2"):
-                    console.write("[WARN] Failed to update kernel on ESP")
-                if not await self.run_in_chroot("install -Dm0644 /boot/initramfs-linux-t2.img /boot/efi/initramfs-linux-t2.img"):
-                    console.write("[WARN] Failed to update initramfs on ESP")
-                await self.run_in_chroot("[ -f /boot/initramfs-linux-t2-fallback.img ] && install -Dm0644 /boot/initramfs-linux-t2-fallback.img /boot/efi/initramfs-linux-t2-fallback.img || true")
-            elif self.bootloader_type == "limine":
-                console.write("Updating kernel/initramfs on ESP for Limine...")
-                if not await self.run_in_chroot("install -Dm0644 /boot/vmlinuz-linux-t2 /boot/efi/vmlinuz-linux-t2"):
-                    console.write("[WARN] Failed to update kernel on ESP for Limine")
-                if not await self.run_in_chroot("install -Dm0644 /boot/initramfs-linux-t2.img /boot/efi/initramfs-linux-t2.img"):
-                    console.write("[WARN] Failed to update initramfs on ESP for Limine")
-                await self.run_in_chroot("[ -f /boot/initramfs-linux-t2-fallback.img ] && install -Dm0644 /boot/initramfs-linux-t2-fallback.img /boot/efi/initramfs-linux-t2-fallback.img || true")
-            self.query_one("#left_panel").focus()
-            self.query_one(TabbedContent).active = "desktop_tab"
+            # systemd-boot and Limine boot from copies on the ESP, so refresh them to pick up the Plymouth hook.
+            esp_loader = {"systemd-boot": "systemd-boot", "limine": "Limine"}.get(self.bootloader_type)
+            if esp_loader:
+                console.write(f"Updating kernel/initramfs on ESP for {esp_loader}...")
+                if not await self.run_in_chroot(list(ESP_KERNEL_COPY_COMMANDS)):
+                    console.write(f"[WARN] Failed to update kernel/initramfs on ESP for {esp_loader}")
+            self.show_tab("desktop_tab")
         else:
             console.write("[ERROR] Plymouth initramfs build failed")
 
     async def create_user_and_services(self):
         """Create the regular user and enable essential services."""
-        console = self.query_one("#console", RichLog)
-        self.username = self.query_one("#username_input").value.strip()
-        user_password = self.query_one("#user_password_input").value.strip()
+        console = self._console
+        self.username = self._input("username_input").value.strip()
+        user_password = self._input("user_password_input").value.strip()
 
         if not self.username:
             console.write("[ERROR] Please enter a username first")
@@ -1949,26 +2595,25 @@ class T2ArchInstaller(App):
             return
 
         commands = [
-                    f"useradd -m -G wheel,storage,power -s /bin/bash {self.username}",
-                    f"echo '{self.username}:{user_password}' | chpasswd",
-                    "echo -e '[device]\\nwifi.backend=iwd' >> /etc/NetworkManager/NetworkManager.conf",
-					"systemctl enable NetworkManager.service",
-                    "systemctl enable iwd.service",
-                    "systemctl enable bluetooth.service",
-                    "systemctl enable systemd-resolved.service",
-                    "systemctl enable t2fanrd.service"
+                    f"useradd -m -G wheel,storage,power -s /bin/bash {shlex.quote(self.username)}",
+                    "chpasswd",
+                    "systemctl enable NetworkManager.service iwd.service bluetooth.service systemd-resolved.service t2fanrd.service",
                     ]
-        for cmd in commands:
-            if not await self.run_in_chroot(cmd):
-                console.write("[ERROR] User creation or service setup failed")
-                return
+        # A conf.d drop-in stays put across NetworkManager upgrades and isn't duplicated on re-runs.
+        if not self.write_target_file("/etc/NetworkManager/conf.d/wifi-iwd.conf", "[device]\nwifi.backend=iwd\n"):
+            console.write("[ERROR] User creation or service setup failed")
+            return
+        # chpasswd reads the password from the script's stdin, which nothing else in the batch uses.
+        if not await self.run_in_chroot(commands, input=f"{self.username}:{user_password}\n"):
+            console.write("[ERROR] User creation or service setup failed")
+            return
         console.write("User and services configured successfully!")
-        self.query_one("#user_password_input").value = ""
-        self.query_one("#no_de_btn").focus()
+        self._input("user_password_input").value = ""
+        self._widget("no_de_btn").focus()
 
     async def add_slsrepo_to_chroot(self) -> bool:
         """Add the slsrepo repository to pacman."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         repo_name = "slsrepo"
         server_url = "https://arch.slsrepo.com/$arch"
         use_chroot = not self.post_install_mode
@@ -1995,9 +2640,7 @@ class T2ArchInstaller(App):
                 return False
         else:
             console.write(f"Adding slsrepo repository...")
-            repo_config = self.build_repo_config(repo_name, server_url)
-            if not await self.run_in_chroot(f"echo -e '{repo_config}' >> /etc/pacman.conf"):
-                console.write("[ERROR] Failed to add slsrepo repository to pacman.conf.")
+            if not self.append_repo_to_pacman_conf(repo_name, server_url, chroot=use_chroot):
                 return False
             if not await self.run_in_chroot("pacman -Sy"):
                 console.write("[ERROR] Failed to refresh pacman databases after adding slsrepo.")
@@ -2005,18 +2648,6 @@ class T2ArchInstaller(App):
             console.write(f"slsrepo repository added to the system's pacman successfully!")
             return True
 
-    def wm_shared_packages(self) -> list[str]:
-        """Packages for window managers (Niri)"""
-        return [
-            "xdg-user-dirs", "xdg-desktop-portal", "xdg-desktop-portal-wlr", "xdg-desktop-portal-gtk", "xdg-utils",
-            "pipewire", "pipewire-alsa", "pipewire-pulse", "pipewire-zeroconf", "wireplumber", "gvfs", "ffmpeg", "accountsservice",
-            "polkit", "polkit-gnome", "swaync", "swayosd", "noto-fonts", "ttf-dejavu", "noto-fonts-emoji", "inter-font", "otf-font-awesome",
-            "waybar", "wl-clipboard", "grim", "slurp", "kanshi", "mako", "fuzzel", "ghostty", "foot", "wayvnc", "jq", "brightnessctl", "duf",
-            "pavucontrol", "pamixer", "pulsemixer", "awww", "swappy", "satty", "kimageformats", "wf-recorder", "mpv", "mpd", "playerctl", "cava",
-            "cliphist", "udiskie", "cups-pk-helper", "network-manager-applet", "khal", "python-pywal", "pastel", "matugen", "imagemagick",
-            "wlr-randr", "wtype", "wlsunset", "dialog", "ddcutil", "i2c-tools", "tuned-ppd", "tesseract",  "tesseract-data-eng", "dgop"
-        ]
-
     async def wm_write_user_file(self, username: str, rel_path: str, content: str, overwrite: bool = True) -> bool:
         """
         Write a file in the user's home using a heredoc.
@@ -2031,11 +2662,25 @@ class T2ArchInstaller(App):
         )
         return await self.run_in_chroot(cmd)
 
+    async def enable_greetd(self, stop_getty: bool = True) -> bool:
+        """
+        Hand tty2 over from getty to greetd and enable greetd, in one chroot call.
+        stop_getty also stops the running tty2 getty (--now), which matters in post-install mode.
+        """
+        now = "--now " if stop_getty else ""
+        if not await self.run_in_chroot(
+            f"systemctl disable {now}getty@tty2.service 2>/dev/null || true && "
+            "systemctl enable greetd.service"
+        ):
+            self._console.write("[ERROR] Failed to enable greetd.service")
+            return False
+        return True
+
     async def wm_install_greetd_dms_greeter(self) -> bool:
         """
         Setup greetd with DMS greeter for Niri.
         """
-        console = self.query_one("#console", RichLog)
+        console = self._console
         console.write("Setting up greetd with DMS greeter...")
 
         if not self.username:
@@ -2043,36 +2688,16 @@ class T2ArchInstaller(App):
             return False
 
         # Configure greetd to use DMS greeter with Niri
-        config_toml = """[terminal]
-vt = 2
-
-[default_session]
-command = "dms-greeter --command niri"
-user = "greeter"
-"""
-
-        override_conf = """[Unit]
-After=systemd-user-sessions.service plymouth-quit.service plymouth-quit-wait.service
-Conflicts=getty@tty2.service
-
-[Service]
-Environment=LIBSEAT_BACKEND=logind
-"""
-
-        if not await self.run_in_chroot(f"install -Dm644 /dev/stdin /etc/greetd/config.toml <<'EOF'\n{config_toml}\nEOF"):
+        if not self.write_target_file("/etc/greetd/config.toml", GREETD_DMS_CONFIG, mode=0o644):
             console.write("[ERROR] Failed to write greetd config.toml")
             return False
 
-        if not await self.run_in_chroot(f"install -d /etc/systemd/system/greetd.service.d && install -Dm644 /dev/stdin /etc/systemd/system/greetd.service.d/override.conf <<'EOF'\n{override_conf}\nEOF"):
+        if not self.write_target_file("/etc/systemd/system/greetd.service.d/override.conf", GREETD_SERVICE_OVERRIDE, mode=0o644):
             console.write("[ERROR] Failed to write greetd override.conf")
             return False
 
-        # Disable getty on tty2 and enable greetd
-        if not await self.run_in_chroot("systemctl disable getty@tty2.service 2>/dev/null || true"):
-            console.write("[WARN] Could not disable getty@tty2")
-
-        if not await self.run_in_chroot("systemctl enable greetd.service"):
-            console.write("[ERROR] Failed to enable greetd.service")
+        # The DMS path never stopped the live tty2 getty, which may be the session in use post-install.
+        if not await self.enable_greetd(stop_getty=False):
             return False
 
         console.write("greetd configured with DMS greeter successfully!")
@@ -2081,29 +2706,23 @@ Environment=LIBSEAT_BACKEND=logind
     async def wm_install_sl_desktop_utils(self) -> bool:
         """
         Installs sl-desktop-utils (sl-greeter, sl-lock and the sl-lock services) from Sl's Arch Repository (slsrepo).
+        slsrepo must already be configured.
         """
-        console = self.query_one("#console", RichLog)
+        console = self._console
         console.write("Setting up sl-greeter and sl-lock by installing sl-desktop-utils...")
 
         if not self.username:
             console.write("[ERROR] Username not set; create user first.")
             return False
 
-        # Add Sl’s Arch Repository to chroot
-        if not await self.add_slsrepo_to_chroot():
-            console.write("[ERROR] Failed to add Sl's Arch Repository")
-            return False
-
-        # Install the sl-desktop-utils package and its dependencies
-        if not await self.run_in_chroot("pacman -S --noconfirm --needed quickshell-git qt6-multimedia niri sl-desktop-utils unzip wayidle-git"):
+        # Install the sl-desktop-utils package and its dependencies (a no-op if the caller already did)
+        if not await self.install_packages(SL_DESKTOP_UTILS_PACKAGES):
             console.write("[ERROR] Failed to install sl-desktop-utils")
             return False
 
         # Set up the user's local bin symlink for the wallpaper
         username = self.username
         setup_wallpaper_cmd = (
-            f"mkdir -p /home/{username}/.config/quickshell && "
-            f"cp -r /usr/share/quickshell/sl-lock /home/{username}/.config/quickshell && "
             f"mkdir -p /home/{username}/.local/bin && "
             f"ln -sf /usr/local/share/backgrounds/sl-greeter-current-background /home/{username}/.local/bin/current-background && "
             f"chown -R {username}:{username} /home/{username}/.local"
@@ -2111,69 +2730,27 @@ Environment=LIBSEAT_BACKEND=logind
         if not await self.run_in_chroot(setup_wallpaper_cmd):
             console.write("[WARN] Could not setup user wallpaper symlink")
 
-        # Disable getty on tty2 and enable greetd
-        if not await self.run_in_chroot(
-            "systemctl disable --now getty@tty2.service 2>/dev/null || true && "
-            "systemctl enable greetd.service"
-        ):
-            console.write("[ERROR] Failed to enable greetd.service")
+        if not await self.enable_greetd():
             return False
 
         console.write("sl-greeter and sl-lock installed and configured successfully!")
         return True
 
-    async def wm_install_sl_desktop_utils(self) -> bool:
-        """
-        Installs sl-desktop-utils (sl-greeter, sl-lock and the sl-lock services) from Sl's Arch Repository (slsrepo).
-        """
-        console = self.query_one("#console", RichLog)
-        console.write("Setting up sl-greeter and sl-lock by installing sl-desktop-utils...")
+    async def install_niri(self) -> bool:
+        console = self._console
+        # console.write("Installing Niri... This might take a while.")
 
         if not self.username:
             console.write("[ERROR] Username not set; create user first.")
             return False
 
-        # Add Sl’s Arch Repository to chroot
+        # Add Sl’s Arch Repository first so Niri and sl-desktop-utils go into one pacman transaction
         if not await self.add_slsrepo_to_chroot():
             console.write("[ERROR] Failed to add Sl's Arch Repository")
             return False
 
-        # Install the sl-desktop-utils package and its dependencies
-        if not await self.run_in_chroot("pacman -S --noconfirm --needed quickshell-git niri sl-desktop-utils unzip wayidle-git"):
-            console.write("[ERROR] Failed to install sl-desktop-utils")
-            return False
-
-        # Set up the user's local bin symlink for the wallpaper
-        username = self.username
-        setup_wallpaper_cmd = (
-            f"mkdir -p /home/{username}/.local/bin && "
-            f"ln -sf /usr/local/share/backgrounds/sl-greeter-current-background /home/{username}/.local/bin/current-background && "
-            f"chown -R {username}:{username} /home/{username}/.local"
-        )
-        if not await self.run_in_chroot(setup_wallpaper_cmd):
-            console.write("[WARN] Could not setup user wallpaper symlink")
-
-        # Disable getty on tty2 and enable greetd
-        if not await self.run_in_chroot(
-            "systemctl disable --now getty@tty2.service 2>/dev/null || true && "
-            "systemctl enable greetd.service"
-        ):
-            console.write("[ERROR] Failed to enable greetd.service")
-            return False
-
-        console.write("sl-greeter and sl-lock installed and configured successfully!")
-        return True
-
-    async def install_niri(self) -> bool:
-        console = self.query_one("#console", RichLog)
-        # console.write("Installing Niri... This might take a while.")
-
-        if not self.username:
-            console.write("[ERROR] Username not set; create user first.")
-            return False
-
-        packages = " ".join(self.wm_shared_packages() + ["niri", "xwayland-satellite", "xdg-desktop-portal-gnome", "gnome-keyring"])
-        if not await self.run_in_chroot(f"pacman -S --noconfirm --needed {packages}", timeout=1800):
+        packages = (*WM_SHARED_PACKAGES, "niri", "xwayland-satellite", "xdg-desktop-portal-gnome", "gnome-keyring", *SL_DESKTOP_UTILS_PACKAGES)
+        if not await self.install_packages(packages, timeout=1800):
             console.write("[ERROR] Failed to install Niri packages.")
             return False
 
@@ -2212,7 +2789,7 @@ Environment=LIBSEAT_BACKEND=logind
 
     async def install_niri_with_dms(self) -> bool:
         """Install Niri with DankMaterialShell (DMS) from slsrepo."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
 
         if not self.username:
             console.write("[ERROR] Username not set; create user first.")
@@ -2223,20 +2800,13 @@ Environment=LIBSEAT_BACKEND=logind
             console.write("[ERROR] Failed to add Sl's Arch Repository")
             return False
 
-        # Install base packages (Niri + shared WM packages)
-        base_packages = self.wm_shared_packages() + ["niri", "xwayland-satellite", "xdg-desktop-portal-gnome", "gnome-keyring", "fprintd", "pam-u2f", "qt6-multimedia", "adw-gtk-theme", "qt6ct-kde"]
-        packages_str = " ".join(base_packages)
-
-        if not await self.run_in_chroot(f"pacman -S --noconfirm --needed {packages_str}", timeout=1800):
-            console.write("[ERROR] Failed to install Niri base packages")
-            return False
-
-        # Install DMS, QuickShell, and dependencies from Sl's Arch Repository
-        console.write("Installing DMS, QuickShell, and dependencies from Sl's Arch Repository...")
-        dms_packages = "quickshell-git dms-shell-niri dms-shell matugen greetd dsearch-git greetd-dms-greeter-git"
-
-        if not await self.run_in_chroot(f"pacman -S --noconfirm --needed {dms_packages}", timeout=600):
-            console.write("[ERROR] Failed to install DMS packages")
+        # Niri + shared WM packages, and DMS, QuickShell and their dependencies from Sl's Arch Repository.
+        # slsrepo is already configured, so both sets go into one pacman transaction and its hooks run once.
+        base_packages = [*WM_SHARED_PACKAGES, "niri", "xwayland-satellite", "xdg-desktop-portal-gnome", "gnome-keyring", "fprintd", "pam-u2f", "qt6-multimedia", "adw-gtk-theme", "qt6ct-kde"]
+        dms_packages = ["quickshell-git", "dms-shell-niri", "dms-shell", "matugen", "greetd", "dsearch-git", "greetd-dms-greeter-git"]
+        console.write("Installing Niri, DMS, QuickShell, and dependencies...")
+        if not await self.install_packages(base_packages + dms_packages, timeout=1800):
+            console.write("[ERROR] Failed to install Niri and DMS packages")
             return False
 
         # Use DMS greeter for DankMaterialShell
@@ -2288,7 +2858,7 @@ Environment=LIBSEAT_BACKEND=logind
 
     async def install_desktop_environment(self, de_type: str, is_manual: bool):
         """Install the selected desktop environment."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
 
         if de_type == "niri":
           console.write("Installing Niri... This might take a while.")
@@ -2297,93 +2867,68 @@ Environment=LIBSEAT_BACKEND=logind
         else:
           console.write(f"Installing {de_type.upper()}... This might take a while.")
 
-        if de_type == "gnome":
-            de_commands = [
-                            "pacman -S --noconfirm --needed gnome gnome-extra gnome-tweaks gnome-power-manager power-profiles-daemon gdm",
-                            "systemctl enable gdm.service",
-                            "systemctl enable power-profiles-daemon.service"
-                          ]
-        if de_type == "kde":
-            de_commands = [
-                            "pacman -S --noconfirm --needed plasma kde-applications sddm",
-                            "systemctl enable plasmalogin.service"
-                          ]
-        if de_type == "cosmic":
-            de_commands = [
-                            "pacman -S --noconfirm --needed cosmic greetd",
-                            "systemctl enable greetd.service",
-                            "systemctl enable cosmic-greeter.service"
-                          ]
-        if de_type == "niri":
-            ok = await self.install_niri()
-            if ok:
-                de_commands = [
-                                "systemctl enable greetd.service"
-                              ]
-                self.query_one("#left_panel").focus()
-                self.query_one(TabbedContent).active = "extras_tab"
-            return
-        if de_type == "niridms":
-            ok = await self.install_niri_with_dms()
+        if de_type in ("niri", "niridms"):
+            # The Niri installers enable greetd themselves; only the tab switch is left to do here.
+            ok = await (self.install_niri() if de_type == "niri" else self.install_niri_with_dms())
             if ok:
-                de_commands = [
-                                "systemctl enable greetd.service"
-                              ]
-                self.query_one("#left_panel").focus()
-                self.query_one(TabbedContent).active = "extras_tab"
+                self.show_tab("extras_tab")
             return
 
-        for cmd in de_commands:
-            if not await self.run_in_chroot(cmd, timeout=1800):
-                console.write(f"[ERROR] {de_type.upper()} installation failed.")
-                return
+        packages, services = DESKTOP_ENVIRONMENTS[de_type]
+        if not await self.install_packages(packages, timeout=1800) or not await self.run_in_chroot(f"systemctl enable {' '.join(services)}"):
+            console.write(f"[ERROR] {de_type.upper()} installation failed.")
+            return
         console.write("Desktop environment installed successfully!")
-        self.query_one("#left_panel").focus()
-        self.query_one(TabbedContent).active = "extras_tab"
+        self.show_tab("extras_tab")
 
     async def install_extras(self):
         """Install additional packages."""
-        console = self.query_one("#console", RichLog)
-        commands = [
-                    "pacman -S --noconfirm --needed ffmpeg pipewire pipewire-zeroconf ghostty fastfetch chafa",
-                    ]
+        console = self._console
+        packages = ["ffmpeg", "pipewire", "pipewire-zeroconf", "ghostty", "fastfetch", "chafa"]
         if await self.target_root_uses_btrfs():
-            commands.append("pacman -S --noconfirm --needed snap-pac")
+            packages.append("snap-pac")
         console.write("Installing extras...")
-        for cmd in commands:
-            if not await self.run_in_chroot(cmd, timeout=600):
-                console.write("[ERROR] Extras installation failed")
-                return
+        if not await self.install_packages(packages):
+            console.write("[ERROR] Extras installation failed")
+            return
         console.write("Extras installed successfully!")
         self.maybe_redirect_completion_from_extras()
 
     async def install_tiny_dfr(self):
         """Install tiny-dfr and apply TouchBar defaults."""
-        console = self.query_one("#console", RichLog)
-        commands = [
-                    "pacman -S --noconfirm --needed tiny-dfr",
-                    "mkdir -p /etc/tiny-dfr",
-                    "cp /usr/share/tiny-dfr/config.toml /etc/tiny-dfr/config.toml",
-                    "sed -i 's/^MediaLayerDefault[[:space:]]*=[[:space:]]*false/MediaLayerDefault = true/' /etc/tiny-dfr/config.toml",
-                    ]
+        console = self._console
         console.write("Installing tiny-dfr...")
-        for cmd in commands:
-            if not await self.run_in_chroot(cmd, timeout=600):
-                console.write("[ERROR] tiny-dfr installation failed")
-                return
+        if not await self.install_packages(("tiny-dfr",)):
+            console.write("[ERROR] tiny-dfr installation failed")
+            return
+        # Copy the packaged defaults from the host side; only the package install needs the chroot.
+        target_root = self._get_target_root()
+        try:
+            os.makedirs(os.path.join(target_root, "etc/tiny-dfr"), exist_ok=True)
+            shutil.copyfile(
+                os.path.join(target_root, "usr/share/tiny-dfr/config.toml"),
+                os.path.join(target_root, "etc/tiny-dfr/config.toml"),
+            )
+        except OSError as e:
+            console.write(f"[ERROR] tiny-dfr installation failed: {e}")
+            return
+        if not self.rewrite_target_file("/etc/tiny-dfr/config.toml", [(_MEDIA_LAYER_OFF, "MediaLayerDefault = true")]):
+            console.write("[ERROR] tiny-dfr installation failed")
+            return
         console.write("tiny-dfr installed successfully!")
         console.write("tiny-dfr config available in /etc/tiny-dfr/config.toml")
         self.maybe_redirect_completion_from_extras()
 
     async def recurring_network_notifications_fix(self):
         """Disable recurring notifications caused by the internal usb ethernet interface connected to the T2 chip."""
-        console = self.query_one("#console", RichLog)
-        commands = [
-                    'cat <<EOF | sudo tee /etc/udev/rules.d/99-network-t2-ncm.rules\\nSUBSYSTEM=="net", ACTION=="add", ATTR{address}=="ac:de:48:00:11:22", NAME="t2_ncm"\\nEOF','cat <<EOF | sudo tee /etc/NetworkManager/conf.d/99-network-t2-ncm.conf\\n[main]\\nno-auto-default=t2_ncm\\nEOF'
-                    ]
+        console = self._console
+        files = {
+            "/etc/udev/rules.d/99-network-t2-ncm.rules": 'SUBSYSTEM=="net", ACTION=="add", ATTR{address}=="ac:de:48:00:11:22", NAME="t2_ncm"\n',
+            "/etc/NetworkManager/conf.d/99-network-t2-ncm.conf": "[main]\nno-auto-default=t2_ncm\n",
+        }
         console.write("Recurring network notifications fix running")
-        for cmd in commands:
-            if not await self.run_in_chroot(cmd):
+        for path, content in files.items():
+            if not self.write_target_file(path, content):
                 console.write("[ERROR] Failed to disable the recurring network manager notifications.")
                 return
         console.write("Recurring network notifications fix successfully applied!")
@@ -2391,24 +2936,20 @@ Environment=LIBSEAT_BACKEND=logind
 
     async def enable_hybrid_graphics(self):
         """Enable iGPU by default via apple-gmux force_igd."""
-        console = self.query_one("#console", RichLog)
-        commands = [
-                    "mkdir -p /etc/modprobe.d",
-                    "printf '%s\\n%s\\n' '# Enable the iGPU by default if present' 'options apple-gmux force_igd=y' > /etc/modprobe.d/apple-gmux.conf",
-                    ]
+        console = self._console
         console.write("Enabling Hybrid Graphics (iGPU)...")
-        for cmd in commands:
-            if not await self.run_in_chroot(cmd):
-                console.write("[ERROR] Failed to enable Hybrid Graphics (iGPU).")
-                return
+        content = "# Enable the iGPU by default if present\noptions apple-gmux force_igd=y\n"
+        if not self.write_target_file("/etc/modprobe.d/apple-gmux.conf", content):
+            console.write("[ERROR] Failed to enable Hybrid Graphics (iGPU).")
+            return
         console.write("Hybrid Graphics (iGPU) enabled in /etc/modprobe.d/apple-gmux.conf!")
         self.maybe_redirect_completion_from_extras()
 
     async def disable_suspend_sleep(self):
         """Set Suspend and Sleep options to no to disable them completely in sleep.conf."""
-        console = self.query_one("#console", RichLog)
-        cmd = "echo -e '\\nAllowSuspend=no\\nAllowHibernation=no\\nAllowHybridSleep=no\\nAllowSuspendThenHibernate=no\\nHibernateOnACPower=no' >> /etc/systemd/sleep.conf"
-        if not await self.run_in_chroot(cmd):
+        console = self._console
+        content = "\nAllowSuspend=no\nAllowHibernation=no\nAllowHybridSleep=no\nAllowSuspendThenHibernate=no\nHibernateOnACPower=no\n"
+        if not self.write_target_file("/etc/systemd/sleep.conf", content, append=True):
             console.write("[ERROR] Failed to disable suspend in sleep.conf")
             return
         console.write("Suspend and Sleep have been successfully disabled in /etc/systemd/sleep.conf!")
@@ -2416,57 +2957,21 @@ Environment=LIBSEAT_BACKEND=logind
 
     async def ignore_lid_switch(self):
         """Set HandleLidSwitch options to ignore to prevent Suspend."""
-        console = self.query_one("#console", RichLog)
-        commands = [
-                    "sed -i 's/^#*HandleLidSwitch=.*/HandleLidSwitch=ignore/' /etc/systemd/logind.conf",
-                    "sed -i 's/^#*HandleLidSwitchDocked=.*/HandleLidSwitchDocked=ignore/' /etc/systemd/logind.conf",
-                    "sed -i 's/^#*HandleLidSwitchExternalPower=.*/HandleLidSwitchExternalPower=ignore/' /etc/systemd/logind.conf",
-                    ]
-        for cmd in commands:
-            if not await self.run_in_chroot(cmd):
-                console.write("[ERROR] Failed to update lid switch settings")
-                return
+        console = self._console
+        if not self.rewrite_target_file("/etc/systemd/logind.conf", [(_LID_SWITCH_LINE, r"\1=ignore")]):
+            console.write("[ERROR] Failed to update lid switch settings")
+            return
         console.write("Lid switch handling set to ignore in /etc/systemd/logind.conf!")
         self.maybe_redirect_completion_from_extras()
 
     async def install_suspend_fix(self):
         """Install the Suspend workaround service."""
-        console = self.query_one("#console", RichLog)
-        def get_path(binary: str) -> str:
-            result = subprocess.run(f"which {binary}", shell=True, capture_output=True, text=True)
-            if result.returncode == 0:
-                return result.stdout.strip() or f"/usr/bin/{binary}"
-            return f"/usr/bin/{binary}"
-        modprobe_path = get_path("modprobe")
-        rmmod_path = get_path("rmmod")
+        console = self._console
+        modprobe_path = _binary_path("modprobe")
+        rmmod_path = _binary_path("rmmod")
         console.write(f"Using modprobe at {modprobe_path} and rmmod at {rmmod_path}")
-        service_content = f"""[Unit]
-Description=Disable and re-enable services to try and fix suspend
-Before=sleep.target
-StopWhenUnneeded=yes
-
-[Service]
-User=root
-Type=oneshot
-RemainAfterExit=yes
-
-ExecStart={modprobe_path} -r brcmfmac_wcc
-ExecStart={modprobe_path} -r brcmfmac
-ExecStart={rmmod_path} -f apple-bce
-
-ExecStop={modprobe_path} apple-bce
-ExecStop={modprobe_path} brcmfmac
-ExecStop={modprobe_path} brcmfmac_wcc
-
-[Install]
-WantedBy=sleep.target
-"""
-        command = (
-            "cat <<\"EOF\" > /etc/systemd/system/suspend-fix-t2.service\n"
-            f"{service_content}"
-            "EOF\n"
-        )
-        if await self.run_in_chroot(command):
+        service_content = SUSPEND_FIX_SERVICE.format(modprobe_path=modprobe_path, rmmod_path=rmmod_path)
+        if self.write_target_file("/etc/systemd/system/suspend-fix-t2.service", service_content, mode=0o644):
             if await self.run_in_chroot("systemctl enable suspend-fix-t2.service"):
                 console.write("Suspend fix installed and enabled!")
                 self.maybe_redirect_completion_from_extras()
@@ -2477,69 +2982,12 @@ WantedBy=sleep.target
 
     async def install_extended_suspend_fix(self):
         """Install the extended template Suspend workaround service, based on deqrocks's Suspend script."""
-        console = self.query_one("#console", RichLog)
-        def get_path(binary: str) -> str:
-            result = subprocess.run(f"which {binary}", shell=True, capture_output=True, text=True)
-            if result.returncode == 0:
-                return result.stdout.strip() or f"/usr/bin/{binary}"
-            return f"/usr/bin/{binary}"
-        modprobe_path = get_path("modprobe")
-        rmmod_path = get_path("rmmod")
+        console = self._console
+        modprobe_path = _binary_path("modprobe")
+        rmmod_path = _binary_path("rmmod")
         console.write(f"Using modprobe at {modprobe_path} and rmmod at {rmmod_path}")
-        service_content = f"""[Unit]
-Description=Unload and Reload Modules for Suspend and Resume
-Before=sleep.target
-StopWhenUnneeded=yes
-
-[Service]
-User=root
-Type=oneshot
-RemainAfterExit=yes
-
-# ExecStart=-/usr/bin/bash -lc 'uid=$$(loginctl list-sessions --no-legend 2>/dev/null | awk "{{print \\$$2}}" | head -n1); [ -n "$$uid" ] || exit 0; [ -S "/run/user/$$uid/bus" ] || exit 0; username=$$(id -nu "$$uid" 2>/dev/null) || exit 0; XDG_RUNTIME_DIR="/run/user/$$uid" DBUS_SESSION_BUS_ADDRESS="unix:path=/run/user/$$uid/bus" runuser -u "$$username" -- systemctl --user stop pipewire.socket pipewire-pulse.socket pipewire.service pipewire-pulse.service wireplumber.service 2>/dev/null || true'
-# ExecStart=-{rmmod_path} -f apple_gmux
-# ExecStart=-/usr/bin/sh -c 'echo 1 > /sys/bus/pci/devices/0000:01:00.0/remove'
-# ExecStart=-/usr/bin/sh -c "/usr/bin/echo 0 | /usr/bin/tee /sys/class/leds/apple::kbd_backlight/brightness"
-ExecStart=-/bin/bash -c "/bin/echo 0 | tee /sys/class/leds/:white:kbd_backlight/brightness"
-# ExecStart=-{rmmod_path} hci_bcm4377
-# ExecStart=-{rmmod_path} brcmfmac_wcc
-# ExecStart=-{rmmod_path} brcmfmac
-# ExecStart=-{rmmod_path} brcmutil
-# ExecStart=-/usr/bin/systemctl stop tiny-dfr.service
-# ExecStart=-/usr/bin/pkill -9 tiny-dfr
-ExecStart=-{rmmod_path} appletbdrm
-ExecStart=-{rmmod_path} hid_appletb_kbd
-ExecStart=-{rmmod_path} hid_appletb_bl
-ExecStart=-{rmmod_path} -f apple-bce
-
-ExecStop={modprobe_path} apple-bce
-ExecStop=/usr/bin/sleep 4
-# ExecStop=-/usr/bin/sh -c 'echo 1 > /sys/bus/pci/rescan'
-# ExecStop=-{modprobe_path} apple_gmux
-# ExecStop=-{modprobe_path} brcmutil
-# ExecStop=-{modprobe_path} brcmfmac
-# ExecStop=-{modprobe_path} brcmfmac_wcc
-# ExecStop=-{modprobe_path} hci_bcm4377
-ExecStop=-{modprobe_path} hid_appletb_bl
-ExecStop=-{modprobe_path} hid_appletb_kbd
-ExecStop=-{modprobe_path} appletbdrm
-ExecStop=/usr/bin/sleep 2
-# ExecStopPost=-/usr/bin/systemctl reset-failed tiny-dfr.service
-# ExecStopPost=-/usr/bin/systemctl restart tiny-dfr.service
-# ExecStopPost=-/usr/bin/sh -c "/usr/bin/echo 255 | /usr/bin/tee /sys/class/leds/apple::kbd_backlight/brightness"
-ExecStopPost=-/bin/bash -c "/bin/echo 255 | tee /sys/class/leds/:white:kbd_backlight/brightness"
-# ExecStopPost=-/usr/bin/bash -lc 'uid=$$(loginctl list-sessions --no-legend 2>/dev/null | awk "{{print \\$$2}}" | head -n1); [ -n "$$uid" ] || exit 0; [ -S "/run/user/$$uid/bus" ] || exit 0; username=$$(id -nu "$$uid" 2>/dev/null) || exit 0; XDG_RUNTIME_DIR="/run/user/$$uid" DBUS_SESSION_BUS_ADDRESS="unix:path=/run/user/$$uid/bus" runuser -u "$$username" -- systemctl --user start pipewire.socket pipewire-pulse.socket wireplumber.service 2>/dev/null || true'
-ExecStopPost=-/usr/bin/systemctl restart upower
-
-[Install]
-WantedBy=sleep.target
-"""
-        command = (
-            "cat <<\"EOF\" > /etc/systemd/system/t2-suspend.service\n"
-            f"{service_content}"
-            "EOF\n"
-        )
-        if await self.run_in_chroot(command):
+        service_content = T2_SUSPEND_SERVICE.format(modprobe_path=modprobe_path, rmmod_path=rmmod_path)
+        if self.write_target_file("/etc/systemd/system/t2-suspend.service", service_content, mode=0o644):
             if await self.run_in_chroot("systemctl enable t2-suspend.service"):
                 console.write("Suspend fix installed and enabled!")
                 self.maybe_redirect_completion_from_extras()
@@ -2548,37 +2996,46 @@ WantedBy=sleep.target
         else:
             console.write("[ERROR] Failed to install extended suspend fix service")
 
+    async def _teardown(self, final_cmd: Optional[str] = None) -> bool:
+        """
+        Unmount the target and turn off swap (install mode only), then run final_cmd, all in one shell.
+        Nothing after the unmount runs if it fails, so a busy /mnt is never rebooted or powered off.
+        """
+        if self.post_install_mode:
+            return await self.run_command(final_cmd) if final_cmd else True
+        rest = "swapoff -a" if not final_cmd else f"swapoff -a; {final_cmd}"
+        return await self.run_command(f"umount -R /mnt && {{ {rest}; }}")
+
     async def unmount_system(self):
         """Unmount filesystems without rebooting."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         if self.post_install_mode:
             console.write("[WARN] Unmount is install-only and will be skipped in post-install mode.")
             return
-        await self.run_command("umount -R /mnt")
-        await self.run_command("swapoff -a")
+        if not await self._teardown():
+            console.write("[ERROR] Failed to unmount /mnt. Close anything still using it and try again.")
+            return
         console.write("Filesystems unmounted. You can now safely power off or reboot.")
 
     async def reboot_system(self):
         """Unmount and reboot the system."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         if not self.post_install_mode:
-            await self.run_command("umount -R /mnt")
-            await self.run_command("swapoff -a")
-            console.write("Filesystems unmounted. Rebooting now...")
+            console.write("Unmounting filesystems and rebooting now...")
         else:
             console.write("Rebooting now...")
-        await self.run_command("reboot")
+        if not await self._teardown("reboot"):
+            console.write("[ERROR] Unmount or reboot failed. Close anything still using /mnt and try again.")
 
     async def shutdown_system(self):
         """Unmount and shutdown the system."""
-        console = self.query_one("#console", RichLog)
+        console = self._console
         if not self.post_install_mode:
-            await self.run_command("umount -R /mnt")
-            await self.run_command("swapoff -a")
-            console.write("Filesystems unmounted. Shutting down now...")
+            console.write("Unmounting filesystems and shutting down now...")
         else:
             console.write("Shutting down now...")
-        await self.run_command("shutdown now")
+        if not await self._teardown("shutdown now"):
+            console.write("[ERROR] Unmount or shutdown failed. Close anything still using /mnt and try again.")
 
 if __name__ == "__main__":
     app = T2ArchInstaller()